@@ -0,0 +1,210 @@
+import os
+import time
+from collections import deque
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, QTimer
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import QApplication, QStyle
+
+# ========= 日志级别 =========
+LEVEL_INFO = "INFO"
+LEVEL_OK = "OK"
+LEVEL_WARN = "WARN"
+LEVEL_ERROR = "ERROR"
+
+_LEVEL_ICONS = {
+    LEVEL_INFO: QStyle.SP_MessageBoxInformation,
+    LEVEL_OK: QStyle.SP_DialogApplyButton,
+    LEVEL_WARN: QStyle.SP_MessageBoxWarning,
+    LEVEL_ERROR: QStyle.SP_MessageBoxCritical,
+}
+
+
+class LogEntry:
+    __slots__ = ("time", "level", "file", "message", "timings")
+
+    def __init__(self, level, message, file="", timings=None):
+        self.time = time.time()
+        self.level = level
+        self.file = file
+        self.message = message
+        # [(阶段名, 秒数), ...]
+        self.timings = timings or []
+
+    def timing_text(self):
+        return "  ".join(f"{stage} {seconds:.2f}s" for stage, seconds in self.timings)
+
+    def to_line(self):
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.time))
+        parts = [stamp, self.level]
+        if self.file: parts.append(self.file)
+        parts.append(self.message)
+        if self.timings: parts.append(self.timing_text())
+        return " | ".join(parts)
+
+
+def prune_log_files(directory, keep):
+    """只保留 directory 下最新的 keep 个 .log 文件（每次启动新建一个日志文件）"""
+    if not os.path.isdir(directory):
+        return
+    logs = sorted((e for e in os.scandir(directory) if e.is_file() and e.name.endswith(".log")),
+                  key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in logs[keep:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass  # 可能正被另一个窗口实例使用
+
+
+class LogModel(QAbstractTableModel):
+    """
+    结构化日志模型：
+    - add() 立即把记录写入 spill_path 日志文件（缓冲写，每次刷新时落盘），视图插入则放进待处理队列
+    - 待处理队列由定时器按固定频率批量插入视图；任务在界面线程里运行时由任务调用 pump() 刷新
+    - 内存中最多保留 max_rows 条（环形缓冲），更早的记录从视图中移除
+    """
+
+    COL_TIME, COL_FILE, COL_MESSAGE, COL_TIMING = range(4)
+    HEADERS = ["时间", "文件", "信息", "阶段耗时"]
+
+    def __init__(self, max_rows=5000, refresh_ms=200, spill_path=None, parent=None):
+        super().__init__(parent)
+        self._rows = deque(maxlen=max_rows)
+        self._pending = []
+        self._icons = {}
+        self._last_pump = 0.0
+
+        self._spill = None
+        self.spill_path = spill_path
+        if spill_path:
+            os.makedirs(os.path.dirname(spill_path), exist_ok=True)
+            self._spill = open(spill_path, "a", encoding="utf-8")
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(refresh_ms)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+
+    # ===== 写入 =====
+    def add(self, level, message, file="", timings=None):
+        entry = LogEntry(level, message, file, timings)
+        # 先写日志文件：程序中途崩溃或被杀掉时，文件里至少有最近一次刷新前的全部记录
+        if self._spill:
+            self._spill.write(entry.to_line() + "\n")
+        self._pending.append(entry)
+        # 待处理队列同样要有上限，视图本来也只保留最后 max_rows 条
+        max_rows = self._rows.maxlen
+        if len(self._pending) >= 2 * max_rows:
+            del self._pending[:-max_rows]
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def pump(self):
+        """
+        任务在界面线程里运行时定时器无法触发，由任务在写日志时调用：
+        距上次刷新超过刷新间隔时把待处理记录插入视图，并处理一次界面事件（重绘、滚动）
+        """
+        now = time.monotonic()
+        if now - self._last_pump < self._timer.interval() / 1000:
+            return
+        self._last_pump = now
+        self.flush()
+        QApplication.processEvents()
+
+    def flush(self):
+        """日志文件落盘，并把待处理记录一次性插入视图"""
+        if self._spill:
+            self._spill.flush()
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+
+        max_rows = self._rows.maxlen
+        if len(pending) > max_rows:
+            pending = pending[-max_rows:]
+
+        overflow = len(self._rows) + len(pending) - max_rows
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self._rows.popleft()
+            self.endRemoveRows()
+
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(pending) - 1)
+        self._rows.extend(pending)
+        self.endInsertRows()
+
+    def clear(self):
+        """清空视图中的记录（日志文件保留）"""
+        self.flush()
+        self.beginResetModel()
+        self._rows.clear()
+        self.endResetModel()
+
+    def close(self):
+        self._timer.stop()
+        self.flush()
+        if self._spill:
+            self._spill.close()
+            self._spill = None
+
+    # ===== 读取 =====
+    def entry(self, row):
+        return self._rows[row]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self._rows[index.row()]
+        col = index.column()
+
+        if role == Qt.DisplayRole:
+            if col == self.COL_TIME:
+                return time.strftime("%H:%M:%S", time.localtime(entry.time))
+            if col == self.COL_FILE:
+                return entry.file
+            if col == self.COL_MESSAGE:
+                return entry.message
+            if col == self.COL_TIMING:
+                return entry.timing_text()
+        elif role == Qt.DecorationRole and col == self.COL_TIME:
+            return self._icon(entry.level)
+        elif role == Qt.ForegroundRole and entry.level == LEVEL_ERROR:
+            return QColor("#f44336")
+        elif role == Qt.ToolTipRole and col == self.COL_MESSAGE:
+            return entry.message
+        return None
+
+    def _icon(self, level):
+        if level not in self._icons:
+            self._icons[level] = QApplication.style().standardIcon(_LEVEL_ICONS[level])
+        return self._icons[level]
+
+
+class LogFilterProxy(QSortFilterProxyModel):
+    """可切换为只显示错误记录"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._errors_only = False
+
+    def set_errors_only(self, enabled):
+        self._errors_only = bool(enabled)
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if not self._errors_only:
+            return True
+        return self.sourceModel().entry(source_row).level == LEVEL_ERROR
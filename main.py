@@ -1,9 +1,12 @@
 import sys
+import multiprocessing
 from PySide6.QtWidgets import QApplication
 from main_window import MainWindow
 
 
 if __name__ == "__main__":
+    # 打包成 exe 后，拆分用的子进程需要它才能正常启动
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
@@ -1,20 +1,30 @@
 import sys
+import multiprocessing
 import os
+import time
 
 root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if root_path not in sys.path:
     sys.path.append(root_path)
 
 from PySide6.QtWidgets import (
-    QWidget, QPushButton, QLabel, QFileDialog,
-    QVBoxLayout, QHBoxLayout, QTextEdit, QMessageBox, QApplication
+    QWidget, QPushButton, QLabel, QFileDialog, QCheckBox, QTableView, QHeaderView,
+    QAbstractItemView, QVBoxLayout, QHBoxLayout, QMessageBox, QApplication
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QFont, QIcon, QColor
 from PySide6.QtCore import QSize
 from tools.splitter1 import split_excel_by_row
 from tools.writer2 import set_smart_print_titles
 from tools.stamper3 import add_stamp_to_excel
+from tools.journal import BatchJournal, STAGE_HEADER, STAGE_STAMP
+from log_view import LogModel, LogFilterProxy, prune_log_files, LEVEL_INFO, LEVEL_OK, LEVEL_WARN, LEVEL_ERROR
+
+# 日志：界面最多保留的记录数、刷新间隔(ms)，完整日志写入用户目录（最多保留的日志文件数）
+LOG_MAX_ROWS = 5000
+LOG_REFRESH_MS = 200
+LOG_KEEP_FILES = 30
+APP_DATA_DIR = os.path.join(os.path.expanduser("~"), ".excel_handle")
 
 
 class MainWindow(QWidget):
@@ -59,11 +69,10 @@ class MainWindow(QWidget):
             QLabel {
                 color: #333;
             }
-            QTextEdit {
+            QTableView {
                 background-color: white;
                 border: 1px solid #ddd;
                 border-radius: 5px;
-                padding: 8px;
                 font-family: 'Courier New';
                 font-size: 11px;
             }
@@ -71,6 +80,10 @@ class MainWindow(QWidget):
 
         self.excel_path = None
         self.output_files = []
+        # 批处理在界面线程中运行，期间由日志刷新处理界面事件，按钮需要禁用以免重入
+        self._busy = False
+        # 批处理日志：中途退出后可从这里继续
+        self.journal = BatchJournal(os.path.join(APP_DATA_DIR, "batch_journal.jsonl"))
 
         self.init_ui()
 
@@ -116,6 +129,11 @@ class MainWindow(QWidget):
         self.export_btn.clicked.connect(self.export_files)
         self.export_btn.setEnabled(False)
 
+        self.resume_btn = QPushButton("⏯️ 继续上次任务")
+        self.resume_btn.setMinimumHeight(40)
+        self.resume_btn.clicked.connect(self.resume_process)
+        self.resume_btn.setEnabled(self.journal.is_resumable())
+
         self.clear_log_btn = QPushButton("🗑️ 清空日志")
         self.clear_log_btn.setMinimumHeight(40)
         self.clear_log_btn.clicked.connect(self.clear_log)
@@ -123,6 +141,7 @@ class MainWindow(QWidget):
         button_layout = QHBoxLayout()
         button_layout.addWidget(self.run_btn)
         button_layout.addWidget(self.export_btn)
+        button_layout.addWidget(self.resume_btn)
         button_layout.addWidget(self.clear_log_btn)
 
         button_group_layout = QVBoxLayout()
@@ -133,13 +152,43 @@ class MainWindow(QWidget):
         log_label_title = QLabel("处理日志:")
         log_label_title.setFont(self._get_section_font())
 
-        self.log_box = QTextEdit()
-        self.log_box.setReadOnly(True)
-        self.log_box.setMinimumHeight(250)
+        self.errors_only_cb = QCheckBox("只看错误")
+        self.errors_only_cb.toggled.connect(self._toggle_errors_only)
+
+        log_title_layout = QHBoxLayout()
+        log_title_layout.addWidget(log_label_title)
+        log_title_layout.addStretch()
+        log_title_layout.addWidget(self.errors_only_cb)
+
+        log_dir = os.path.join(APP_DATA_DIR, "logs")
+        # 新日志文件创建前清理，连同本次一共保留 LOG_KEEP_FILES 个
+        prune_log_files(log_dir, LOG_KEEP_FILES - 1)
+        log_path = os.path.join(log_dir, time.strftime("%Y%m%d_%H%M%S") + ".log")
+        self.log_model = LogModel(LOG_MAX_ROWS, LOG_REFRESH_MS, log_path, self)
+        self.log_proxy = LogFilterProxy(self)
+        self.log_proxy.setSourceModel(self.log_model)
+        self.log_model.rowsInserted.connect(self._scroll_log_to_bottom)
+
+        self.log_view = QTableView()
+        self.log_view.setModel(self.log_proxy)
+        self.log_view.setMinimumHeight(250)
+        self.log_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.log_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.log_view.setWordWrap(False)
+        self.log_view.verticalHeader().hide()
+        # 固定行高，避免大量记录时逐行计算尺寸
+        self.log_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.log_view.verticalHeader().setDefaultSectionSize(22)
+        header = self.log_view.horizontalHeader()
+        header.setSectionResizeMode(LogModel.COL_TIME, QHeaderView.Fixed)
+        header.resizeSection(LogModel.COL_TIME, 90)
+        header.resizeSection(LogModel.COL_FILE, 180)
+        header.setSectionResizeMode(LogModel.COL_MESSAGE, QHeaderView.Stretch)
+        header.resizeSection(LogModel.COL_TIMING, 170)
 
         log_group_layout = QVBoxLayout()
-        log_group_layout.addWidget(log_label_title)
-        log_group_layout.addWidget(self.log_box)
+        log_group_layout.addLayout(log_title_layout)
+        log_group_layout.addWidget(self.log_view)
 
         # ===== 状态栏 =====
         status_layout = QHBoxLayout()
@@ -164,6 +213,10 @@ class MainWindow(QWidget):
 
         self.setLayout(main_layout)
 
+        self.log(f"完整日志保存在: {log_path}")
+        if self.journal.is_resumable():
+            self.log(f"⚠️ 上次任务未完成（{len(self.journal.inputs)} 个文件），可点击“继续上次任务”", LEVEL_WARN)
+
     def _get_section_font(self):
         font = QFont()
         font.setPointSize(11)
@@ -181,7 +234,7 @@ class MainWindow(QWidget):
             file_names = [os.path.basename(path) for path in paths]
             self.file_label.setText(
                 f"已选择 {len(paths)} 个文件: {', '.join(file_names[:3])}{'...' if len(file_names) > 3 else ''}")
-            self.log(f"✅ 已选择 {len(paths)} 个文件")
+            self.log(f"✅ 已选择 {len(paths)} 个文件", LEVEL_OK)
             self._update_status(f"已选择 {len(paths)} 个文件，可以开始处理", "#0078d4")
 
     def run_process(self):
@@ -189,77 +242,173 @@ class MainWindow(QWidget):
         if not hasattr(self, 'excel_paths') or not self.excel_paths:
             QMessageBox.warning(self, "提示", "请先选择 Excel 文件")
             return
+        self._run_batch(resume=False)
+
+    def resume_process(self):
+        """继续上次未完成的批处理：跳过已完成的文件和阶段"""
+        if not self.journal.is_resumable():
+            QMessageBox.warning(self, "提示", "没有可继续的任务")
+            return
+        self.excel_paths = list(self.journal.inputs)
+        self.file_label.setText(f"继续上次任务: {len(self.excel_paths)} 个文件")
+        self._run_batch(resume=True)
 
+    def _run_batch(self, resume):
         # 获取当前文件 (main_window.py) 的绝对路径：c:\Users\xinan\PycharmProjects\excel_handle\
         root_dir = os.path.dirname(os.path.abspath(__file__))
         # 直接进入 pic 目录：c:\Users\xinan\PycharmProjects\excel_handle\pic\stamp.png
         stamp_path = os.path.join(root_dir, "pic", "stamp.png")
 
         self._update_status("正在批量处理文件...", "#ff9800")
-        self.log("=" * 50)
-        self.log("🚀 开始批量处理任务")
+        self.log("⏯️ 继续上次未完成的任务" if resume else "🚀 开始批量处理任务")
+        self._set_busy(True)
 
+        journal = self.journal
+        executor = None
         try:
-            import tempfile
-            from tools.splitter1 import split_excel_by_row
+            from tools.splitter1 import split_excel_by_row, create_executor
             from tools.writer2 import set_smart_print_titles
             from tools.stamper3 import add_stamp_to_excel
+            from tools.xlsx_save import COMPRESSION_STORED, COMPRESSION_FINAL
+
+            if not resume:
+                # 上一批的输出文件就在临时目录里，start() 会清理掉，先让导出按钮失效
+                self.output_files = []
+                self.export_btn.setEnabled(False)
+                journal.start(self.excel_paths, stamp_path)
+
+            # 整批共用一个拆分进程池：进程只在第一次需要并行时启动，Windows 下不必每个文件重新导入界面模块
+            executor = create_executor()
 
             all_output_files = []  # 保存所有文件的输出路径
+            failed_inputs = []  # 处理失败的输入文件
 
             # 循环处理每个文件
             for file_idx, excel_path in enumerate(self.excel_paths, 1):
-                self.log(f"\n📁 处理文件 {file_idx}/{len(self.excel_paths)}: {os.path.basename(excel_path)}")
-                self.log("-" * 40)
-
-                temp_dir = tempfile.mkdtemp()
-
-                # 获取原文件名（不含扩展名）用于输出命名
-                input_filename = os.path.splitext(os.path.basename(excel_path))[0]
-                temp_prefix = os.path.join(temp_dir, input_filename)
-
-                # --- Step 1: 拆分 ---
-                self.log("Step 1: 正在拆分 Excel...")
-                split_files = split_excel_by_row(excel_path, temp_prefix)
-                if not split_files:
-                    self.log("❌ 未生成任何拆分文件")
+                excel_name = os.path.basename(excel_path)
+                temp_dir, split_files = journal.split_result(excel_path)
+
+                # 只跳过成功的输入；失败的（如文件正被 Excel 占用）继续任务时重试
+                done = journal.input_result(excel_path)
+                if done and done[0]:
+                    all_output_files.extend(split_files or [])
+                    self.log(f"⏭️ 已完成，跳过 {file_idx}/{len(self.excel_paths)}", file=excel_name)
                     continue
-                self.log(f"✅ 拆分完成，生成 {len(split_files)} 个文件")
-
-                # --- Step 2 & 3: 循环处理子文件 ---
-                self.log("Step 2 & 3: 执行表头固定与自动盖章...")
-
-                for idx, file_path in enumerate(split_files, 1):
-                    f_name = os.path.basename(file_path)
-
-                    # 1. 设置打印固定行 (writer2)
-                    ok_h, msg_h = set_smart_print_titles(file_path)
 
-                    # 2. 盖章 (stamp3)
-                    ok_s, msg_s = add_stamp_to_excel(file_path, stamp_path)
-
-                    # 日志记录
-                    self.log(f"  [{idx}] {f_name}")
-                    self.log(f"      └─ 表头: {'✅' if ok_h else '❌'} {msg_h}")
-                    self.log(f"      └─ 印章: {'✅' if ok_s else '❌'} {msg_s}")
+                if done:
+                    self.log(f"🔁 重试上次失败的文件 {file_idx}/{len(self.excel_paths)}: {done[1]}", LEVEL_WARN,
+                             file=excel_name)
+                else:
+                    self.log(f"📁 处理文件 {file_idx}/{len(self.excel_paths)}", file=excel_name)
+
+                # 单个输入出错（表头缺失、文件损坏等）只记为失败，继续处理下一个文件
+                try:
+                    # --- Step 1: 拆分（日志里有结果且文件都还在就不重复拆分）---
+                    if split_files and all(os.path.exists(f) for f in split_files):
+                        self.log(f"⏭️ 拆分已完成 ({len(split_files)} 个文件)", file=excel_name)
+                    else:
+                        if not temp_dir or not os.path.isdir(temp_dir):
+                            temp_dir = journal.make_temp_dir()
+
+                        # 获取原文件名（不含扩展名）用于输出命名
+                        input_filename = os.path.splitext(os.path.basename(excel_path))[0]
+                        temp_prefix = os.path.join(temp_dir, input_filename)
+
+                        # 拆分和表头两步的结果马上会被下一步重新加载，不压缩；只有盖章后的交付文件完整压缩
+                        t0 = time.perf_counter()
+                        split_files = split_excel_by_row(excel_path, temp_prefix, compression=COMPRESSION_STORED,
+                                                         executor=executor)
+                        t_split = time.perf_counter() - t0
+                        journal.record_split(excel_path, temp_dir, split_files)
+                        if not split_files:
+                            raise ValueError("未生成任何拆分文件")
+                        self.log(f"✅ 拆分完成，生成 {len(split_files)} 个文件", LEVEL_OK, file=excel_name,
+                                 timings=[("拆分", t_split)])
+
+                        # 核对各子表的 TOTAL / TOTAL DAP 表尾，只报告不改写；
+                        # 这一步只是辅助检查（需要 numpy），失败只记警告，不影响后面的表头和盖章
+                        t0 = time.perf_counter()
+                        try:
+                            from tools.totals4 import check_table_totals
+                            ok_t, msg_t, report_t = check_table_totals(split_files)
+                        except Exception as e:
+                            self.log(f"⚠️ 合计核对失败，已跳过: {str(e)}", LEVEL_WARN, file=excel_name)
+                        else:
+                            self.log(f"🧮 合计核对: {msg_t}", LEVEL_OK if ok_t else LEVEL_WARN, file=excel_name,
+                                     timings=[("合计", time.perf_counter() - t0)])
+                            for mismatch in report_t["mismatches"]:
+                                self.log(f"❌ {mismatch}", LEVEL_ERROR, file=excel_name)
+
+                    # --- Step 2 & 3: 循环处理子文件，每个输出文件一行日志 ---
+                    for idx, file_path in enumerate(split_files, 1):
+                        f_name = os.path.basename(file_path)
+                        timings = []
+
+                        # 1. 设置打印固定行 (writer2)
+                        result_h = journal.stage_result(file_path, STAGE_HEADER)
+                        if result_h and result_h[0]:
+                            ok_h, msg_h = result_h
+                        else:
+                            t0 = time.perf_counter()
+                            ok_h, msg_h = set_smart_print_titles(file_path, compression=COMPRESSION_STORED)
+                            timings.append(("表头", time.perf_counter() - t0))
+                            journal.record_stage(excel_path, file_path, STAGE_HEADER, ok_h, msg_h)
+
+                        # 2. 盖章 (stamp3)
+                        result_s = journal.stage_result(file_path, STAGE_STAMP)
+                        if result_s and result_s[0]:
+                            ok_s, msg_s = result_s
+                        else:
+                            t0 = time.perf_counter()
+                            ok_s, msg_s = add_stamp_to_excel(file_path, stamp_path, compression=COMPRESSION_FINAL)
+                            timings.append(("印章", time.perf_counter() - t0))
+                            journal.record_stage(excel_path, file_path, STAGE_STAMP, ok_s, msg_s)
+
+                        # 日志记录（两步都是从日志恢复的就不再重复输出）
+                        if timings:
+                            self.log(f"[{idx}] 表头: {msg_h} | 印章: {msg_s}",
+                                     LEVEL_OK if ok_h and ok_s else LEVEL_ERROR, file=f_name, timings=timings)
+
+                except Exception as e:
+                    failed_inputs.append(excel_name)
+                    journal.record_input_done(excel_path, False, str(e))
+                    self.log(f"❌ 处理失败: {str(e)}", LEVEL_ERROR, file=excel_name)
+                    continue
 
+                journal.record_input_done(excel_path)
                 all_output_files.extend(split_files)
 
+            # 有失败的输入时批次保持未完成，排除问题（如关闭占用文件的 Excel）后可点“继续上次任务”只重试失败的文件
+            if not failed_inputs:
+                journal.finish()
+
             # --- 任务完成 ---
             self.output_files = all_output_files
-            self.log("=" * 50)
             self.log(
-                f"🎉 批量处理完毕！共处理 {len(self.excel_paths)} 个输入文件，生成 {len(all_output_files)} 个输出文件。")
+                f"🎉 批量处理完毕！共处理 {len(self.excel_paths)} 个输入文件，生成 {len(all_output_files)} 个输出文件。",
+                LEVEL_OK)
 
             self.export_btn.setEnabled(True)
-            self._update_status(f"✅ 处理完成，共生成 {len(all_output_files)} 个文件", "#28a745")
+            if failed_inputs:
+                self.log(f"⚠️ {len(failed_inputs)} 个文件处理失败: {', '.join(failed_inputs)}，可点击“继续上次任务”重试",
+                         LEVEL_WARN)
+                self._update_status(f"⚠️ 处理完成，{len(failed_inputs)} 个文件失败，共生成 {len(all_output_files)} 个文件",
+                                    "#ff9800")
+            else:
+                self._update_status(f"✅ 处理完成，共生成 {len(all_output_files)} 个文件", "#28a745")
             QMessageBox.information(self, "完成",
-                                    f"所有文件已处理完毕！\n输入: {len(self.excel_paths)} 个文件\n输出: {len(all_output_files)} 个文件")
+                                    f"所有文件已处理完毕！\n输入: {len(self.excel_paths)} 个文件\n输出: {len(all_output_files)} 个文件"
+                                    + (f"\n失败: {', '.join(failed_inputs)}" if failed_inputs else ""))
 
         except Exception as e:
-            self.log(f"❌ 流程中断: {str(e)}")
-            self._update_status("❌ 处理失败", "#f44336")
+            self.log(f"❌ 流程中断: {str(e)}", LEVEL_ERROR)
+            self._update_status("❌ 处理失败，可点击“继续上次任务”从中断处继续", "#f44336")
             QMessageBox.critical(self, "错误", f"处理失败：\n{str(e)}")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            journal.close()
+            self._set_busy(False)
 
     def export_files(self):
         """导出所有文件到指定目录"""
@@ -273,14 +422,12 @@ class MainWindow(QWidget):
         )
 
         if not output_dir:
-            self.log("⚠️ 已取消导出")
+            self.log("⚠️ 已取消导出", LEVEL_WARN)
             return
 
         try:
             self._update_status("导出中...", "#ff9800")
-            self.log("=" * 50)
             self.log(f"开始导出到: {output_dir}")
-            self.log("-" * 50)
 
             import shutil
 
@@ -293,29 +440,58 @@ class MainWindow(QWidget):
                 dest_file = os.path.join(output_dir, filename)
                 shutil.copy2(source_file, dest_file)
                 exported_files.append(dest_file)
-                self.log(f"  {idx}. {filename}")
+                self.log(f"{idx}. 已导出", file=filename)
 
-            self.log("-" * 50)
-            self.log(f"✅ 导出完成 共导出 {len(exported_files)} 个文件")
-            self.log("=" * 50)
+            self.log(f"✅ 导出完成 共导出 {len(exported_files)} 个文件", LEVEL_OK)
 
             self._update_status(f"✅ 导出完成 ({len(exported_files)} 个文件)", "#28a745")
             QMessageBox.information(self, "✅ 导出完成", f"成功导出 {len(exported_files)} 个文件到:\n{output_dir}")
 
         except Exception as e:
-            self.log(f"❌ 导出失败: {str(e)}")
-            self.log("=" * 50)
+            self.log(f"❌ 导出失败: {str(e)}", LEVEL_ERROR)
             self._update_status("❌ 导出失败", "#f44336")
             QMessageBox.critical(self, "❌ 错误", f"导出失败：{str(e)}")
 
     def clear_log(self):
-        """清空日志"""
-        self.log_box.clear()
+        """清空日志（只清界面，完整日志文件保留）"""
+        self.log_model.clear()
         self.log("日志已清空")
 
-    def log(self, text):
-        """添加日志"""
-        self.log_box.append(text)
+    def log(self, text, level=LEVEL_INFO, file="", timings=None):
+        """添加日志：按固定频率批量刷新到界面，并写入完整日志文件"""
+        self.log_model.add(level, text, file, timings)
+        if self._busy:
+            self.log_model.pump()
+
+    def _set_busy(self, busy):
+        """批处理期间禁用会再次触发处理或修改文件列表的按钮"""
+        self._busy = busy
+        for btn in (self.select_btn, self.run_btn, self.clear_log_btn):
+            btn.setEnabled(not busy)
+        self.resume_btn.setEnabled(not busy and self.journal.is_resumable())
+        if busy:
+            self.export_btn.setEnabled(False)
+        else:
+            self.export_btn.setEnabled(bool(self.output_files))
+
+    def _toggle_errors_only(self, checked):
+        self.log_proxy.set_errors_only(checked)
+
+    def _scroll_log_to_bottom(self):
+        # 只有在用户停留在底部时才自动跟随，避免打断翻看历史
+        bar = self.log_view.verticalScrollBar()
+        if bar.value() >= bar.maximum() - self.log_view.verticalHeader().defaultSectionSize() * 2:
+            QTimer.singleShot(0, self.log_view.scrollToBottom)
+
+    def closeEvent(self, event):
+        if self._busy:
+            # 处理中途关闭会留下写了一半的文件，等当前批次结束；强行退出后可用“继续上次任务”恢复
+            QMessageBox.warning(self, "提示", "正在处理文件，请等待当前任务完成")
+            event.ignore()
+            return
+        self.log_model.close()
+        self.journal.close()
+        super().closeEvent(event)
 
     def _update_status(self, text, color):
         """更新状态标签"""
@@ -324,6 +500,8 @@ class MainWindow(QWidget):
 
 
 if __name__ == "__main__":
+    # 打包成 exe 后，拆分用的子进程需要它才能正常启动
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
@@ -0,0 +1,158 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+
+# ========= 阶段名 =========
+STAGE_HEADER = "header"
+STAGE_STAMP = "stamp"
+
+
+class BatchJournal:
+    """
+    批处理任务日志（追加写入的 JSONL，每条记录落盘后才返回）。
+    记录每个输入文件的拆分结果和每个输出文件的各阶段完成情况，
+    程序中途退出后可以据此跳过已完成的工作继续处理。
+
+    记录格式（每行一条）：
+      {"event": "batch", "inputs": [...], "stamp": ...}
+      {"event": "split", "input": ..., "temp_dir": ..., "outputs": [...]}
+      {"event": "stage", "input": ..., "output": ..., "stage": "header" | "stamp", "ok": true, "msg": ...}
+      {"event": "input_done", "input": ..., "ok": true, "msg": ...}
+      {"event": "batch_done"}
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # 本批次所有临时目录都建在这里，开始新批次时整个清空，拆分中途失败或崩溃也不会留下无人记录的目录
+        self.work_root = os.path.join(os.path.dirname(os.path.abspath(path)), "work")
+        self._file = None
+        self._reset_state()
+        self._load()
+
+    def _reset_state(self):
+        self.inputs = []
+        self.stamp_path = None
+        self.finished = True
+        self._splits = {}
+        self._stages = {}
+        # {输入文件: (ok, msg)}；失败的输入继续任务时会重试，成功后被新记录覆盖
+        self._done_inputs = {}
+
+    # ===== 读取 / 重放 =====
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = f.read()
+
+        valid_bytes = 0
+        for line in data.splitlines(keepends=True):
+            # 最后一行可能在写入时断电被截断，截断处之后的内容全部丢弃
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            self._apply(record)
+            valid_bytes += len(line)
+
+        if valid_bytes < len(data):
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_bytes)
+
+    def _apply(self, record):
+        event = record.get("event")
+        if event == "batch":
+            self._reset_state()
+            self.inputs = record["inputs"]
+            self.stamp_path = record.get("stamp")
+            self.finished = False
+        elif event == "split":
+            self._splits[record["input"]] = (record["temp_dir"], record["outputs"])
+            # 重新拆分会覆盖同名输出文件，这些文件之前的阶段记录随之作废
+            for output in record["outputs"]:
+                for stage in (STAGE_HEADER, STAGE_STAMP):
+                    self._stages.pop((output, stage), None)
+        elif event == "stage":
+            self._stages[(record["output"], record["stage"])] = (record["ok"], record.get("msg", ""))
+        elif event == "input_done":
+            self._done_inputs[record["input"]] = (record.get("ok", True), record.get("msg", ""))
+        elif event == "batch_done":
+            self.finished = True
+
+    # ===== 写入 =====
+    def _append(self, record):
+        record["time"] = time.time()
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._apply(record)
+
+    def start(self, inputs, stamp_path=None):
+        """开始新的批处理：清理上一批的临时目录，覆盖旧日志"""
+        self.close()
+        for temp_dir in self.temp_dirs():
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        shutil.rmtree(self.work_root, ignore_errors=True)
+        dir_name = os.path.dirname(self.path)
+        if dir_name: os.makedirs(dir_name, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        record = {"event": "batch", "inputs": list(inputs), "stamp": stamp_path, "time": time.time()}
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._apply(record)
+
+    def make_temp_dir(self):
+        """在 work_root 下新建本批次的临时目录"""
+        os.makedirs(self.work_root, exist_ok=True)
+        return tempfile.mkdtemp(dir=self.work_root)
+
+    def record_split(self, input_path, temp_dir, outputs):
+        self._append({"event": "split", "input": input_path, "temp_dir": temp_dir, "outputs": list(outputs)})
+
+    def record_stage(self, input_path, output_path, stage, ok, msg=""):
+        self._append({"event": "stage", "input": input_path, "output": output_path,
+                      "stage": stage, "ok": bool(ok), "msg": msg})
+
+    def record_input_done(self, input_path, ok=True, msg=""):
+        self._append({"event": "input_done", "input": input_path, "ok": bool(ok), "msg": msg})
+
+    def finish(self):
+        self._append({"event": "batch_done"})
+        self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # ===== 查询 =====
+    def is_resumable(self):
+        return bool(self.inputs) and not self.finished
+
+    def is_input_done(self, input_path):
+        """输入文件已成功处理完（失败的不算，继续任务时会重试）"""
+        return self._done_inputs.get(input_path, (False, ""))[0]
+
+    def input_result(self, input_path):
+        """返回 (ok, msg)；尚未处理完返回 None"""
+        return self._done_inputs.get(input_path)
+
+    def split_result(self, input_path):
+        """返回 (temp_dir, outputs)；未拆分过返回 (None, None)"""
+        return self._splits.get(input_path, (None, None))
+
+    def stage_result(self, output_path, stage):
+        """返回 (ok, msg)；该阶段未执行过返回 None"""
+        return self._stages.get((output_path, stage))
+
+    def temp_dirs(self):
+        return [temp_dir for temp_dir, _ in self._splits.values()]
@@ -0,0 +1,122 @@
+import math
+from array import array
+from copy import copy
+from openpyxl.utils import get_column_letter
+
+# ========= 行标记位 =========
+ROW_BLANK = 1
+ROW_HEADER_END = 2
+ROW_COMPANY_1 = 4
+ROW_COMPANY_2 = 8
+ROW_TOTAL = 16
+ROW_TOTAL_DAP = 32
+ROW_ITEM_NO = 64
+
+NO_STYLE = -1
+
+
+class SheetModel:
+    """
+    解析后工作表的紧凑中间表示，取代逐个访问 openpyxl Cell。
+    - columns:   按列存放的值列表，columns[c - 1][r - 1]
+    - style_ids: 按列存放的样式下标 array('i')，指向去重后的 styles（NO_STYLE 表示无样式）
+    - heights:   行高 array('d')，NaN 表示原表未设置
+    - flags:     行标记 array('B')（空行 / 表头结束 / 关键字等）
+    对象可 pickle，拆分时直接作为子进程共享的源数据快照。
+    """
+
+    __slots__ = ("n_rows", "n_cols", "columns", "style_ids", "styles",
+                 "heights", "flags", "col_widths", "merges")
+
+    @classmethod
+    def from_worksheet(cls, ws, classify=None):
+        """
+        一次遍历读取整张表。
+        classify(values) -> int：根据一行的值返回额外的行标记位（空行标记由模型自己计算）。
+        """
+        model = cls()
+        model.n_rows = ws.max_row
+        model.n_cols = ws.max_column
+        model.columns = [[] for _ in range(model.n_cols)]
+        model.style_ids = [array('i') for _ in range(model.n_cols)]
+        model.styles = []
+        model.heights = array('d')
+        model.flags = array('B')
+
+        style_index = {}
+        for r, row in enumerate(ws.iter_rows(min_row=1, max_row=model.n_rows, max_col=model.n_cols), 1):
+            values = []
+            for c, cell in enumerate(row):
+                value = cell.value
+                values.append(value)
+                model.columns[c].append(value)
+
+                if not cell.has_style:
+                    model.style_ids[c].append(NO_STYLE)
+                    continue
+                key = tuple(cell._style)
+                sid = style_index.get(key)
+                if sid is None:
+                    sid = len(model.styles)
+                    style_index[key] = sid
+                    model.styles.append((copy(cell.font), copy(cell.border), copy(cell.fill),
+                                         cell.number_format, copy(cell.protection), copy(cell.alignment)))
+                model.style_ids[c].append(sid)
+
+            flags = classify(values) if classify else 0
+            if all(v in (None, "") for v in values):
+                flags |= ROW_BLANK
+            model.flags.append(flags)
+
+            height = ws.row_dimensions[r].height if r in ws.row_dimensions else None
+            model.heights.append(math.nan if height is None else height)
+
+        model.col_widths = {}
+        for c in range(1, model.n_cols + 1):
+            letter = get_column_letter(c)
+            if letter in ws.column_dimensions:
+                model.col_widths[letter] = ws.column_dimensions[letter].width
+        model.merges = [(m.min_row, m.min_col, m.max_row, m.max_col) for m in ws.merged_cells.ranges]
+        return model
+
+    def value(self, r, c):
+        return self.columns[c - 1][r - 1]
+
+    def has_flag(self, r, flag):
+        return bool(self.flags[r - 1] & flag)
+
+    def height(self, r):
+        h = self.heights[r - 1]
+        return None if math.isnan(h) else h
+
+    def find_in_row(self, r, key, upper=False):
+        """返回第 r 行第一个文本包含 key 的列号，找不到返回 None"""
+        for c, col in enumerate(self.columns, 1):
+            v = col[r - 1]
+            if not v:
+                continue
+            text = str(v).strip().upper() if upper else str(v)
+            if key in text:
+                return c
+        return None
+
+    def apply_style(self, r, c, target_cell, cache=None):
+        """
+        与 splitter 的 copy_cell_style 等价：把第 r 行第 c 列的样式写到目标单元格。
+        cache: 同一目标工作簿共用的 dict，每种样式只在目标工作簿里登记一次，之后直接复用样式下标。
+        """
+        sid = self.style_ids[c - 1][r - 1]
+        if sid == NO_STYLE:
+            return
+        if cache is not None and sid in cache:
+            target_cell._style = copy(cache[sid])
+            return
+        font, border, fill, number_format, protection, alignment = self.styles[sid]
+        target_cell.font = copy(font)
+        target_cell.border = copy(border)
+        target_cell.fill = copy(fill)
+        target_cell.number_format = number_format
+        target_cell.protection = copy(protection)
+        target_cell.alignment = copy(alignment)
+        if cache is not None:
+            cache[sid] = copy(target_cell._style)
@@ -1,24 +1,37 @@
+import multiprocessing
 import os
+import pickle
+import sys
+import tempfile
+import time
 from copy import copy
+from concurrent.futures import ProcessPoolExecutor
 from openpyxl import load_workbook, Workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.page import PageMargins
 from openpyxl.styles import Font, Alignment
 
+from tools.xlsx_save import save_workbook, COMPRESSION_FINAL
+from tools.sheet_model import (
+    SheetModel, ROW_BLANK, ROW_HEADER_END, ROW_COMPANY_1, ROW_COMPANY_2,
+    ROW_TOTAL, ROW_TOTAL_DAP, ROW_ITEM_NO,
+)
+
 # ========= 关键字 =========
 HEADER_END_KEYS = ["ITEM NO.", "DESCRIPTION"]
 COMPANY_KEY_1 = "P&G"
 COMPANY_KEY_2 = "PROCTER & GAMBLE (GUANGZHOU) LTD."
 
-
-def _row_text(row):
-    return " ".join(str(c.value).strip() for c in row if c.value is not None)
+# ========= 并行配置 =========
+# 没有传入共用进程池时，子表总行数达到该值才新建进程池并行生成。
+# 实测（见 README「拆分并行」）：生成子表约 2.5 ms/行，新建进程池每个进程约 0.37 s 启动开销；
+# 4 核时 行数 × 2.5 ms × (1 - 1/4) ≥ 4 × 0.37 s，约 800 行才能收回启动开销。
+# 共用进程池（executor）只有快照读写约 10-20 ms 的开销，有 2 张以上子表就并行。
+PARALLEL_MIN_ROWS = 800
 
 
-def _is_header_start(row1_text, row2_text):
-    has_pg = COMPANY_KEY_1 in row1_text
-    has_full_name = COMPANY_KEY_2 in row2_text
-    return has_pg and has_full_name
+def _row_text(values):
+    return " ".join(str(v).strip() for v in values if v is not None)
 
 
 def _is_header_end(text):
@@ -36,27 +49,76 @@ def copy_cell_style(source_cell, target_cell):
         target_cell.alignment = copy(source_cell.alignment)
 
 
-def split_excel_by_row(input_path, output_prefix, split_size=30):
-    def _get_new_col_idx(old_idx):
-        if old_idx <= 3: return old_idx
-        return old_idx + 1
+def _get_new_col_idx(old_idx):
+    if old_idx <= 3: return old_idx
+    return old_idx + 1
+
+
+def _classify_row(values):
+    """读入 SheetModel 时为每行打上关键字标记，后续扫描只看标记位"""
+    text = _row_text(values)
+    flags = 0
+    if _is_header_end(text): flags |= ROW_HEADER_END
+    if COMPANY_KEY_1 in text: flags |= ROW_COMPANY_1
+    if COMPANY_KEY_2 in text: flags |= ROW_COMPANY_2
+    if "TOTAL" in text: flags |= ROW_TOTAL
+    if "ITEM NO" in text: flags |= ROW_ITEM_NO
+    if any("TOTAL DAP" in str(v or "").strip().upper() for v in values): flags |= ROW_TOTAL_DAP
+    return flags
+
+
+# 子进程内的快照（由进程池 initializer 反序列化一次，各任务共享）
+def pool_context():
+    """
+    子进程启动方式：GUI / 监听服务的主进程里都有其他线程，fork 多线程进程可能死锁，
+    POSIX 下用 forkserver（由单线程的服务进程 fork），Windows 只支持 spawn
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def create_executor(workers=None):
+    """
+    创建可在整批文件间复用的进程池，传给 split_excel_by_row(executor=...)。
+    进程在第一次提交任务时才启动，子表都不多时不会有启动开销；用完需调用方 shutdown()。
+    """
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, mp_context=pool_context())
 
+
+# 子进程缓存的快照：(快照文件路径, SheetModel)；同一个输入的各子表只反序列化一次
+_WORKER_SNAPSHOT = (None, None)
+
+
+def _write_table_in_worker(snapshot_path, plan):
+    global _WORKER_SNAPSHOT
+    if _WORKER_SNAPSHOT[0] != snapshot_path:
+        with open(snapshot_path, "rb") as f:
+            _WORKER_SNAPSHOT = (snapshot_path, pickle.load(f))
+    return _write_table(_WORKER_SNAPSHOT[1], plan)
+
+
+def split_excel_by_row(input_path, output_prefix, split_size=30, workers=None, compression=COMPRESSION_FINAL,
+                       executor=None):
+    """
+    按表头拆分 Excel，每张子表输出一个文件。
+    workers: 并行进程数；None 表示按 CPU 核数和子表规模自动决定（见 PARALLEL_MIN_ROWS），1 表示在当前进程串行生成。
+    compression: 输出文件的压缩档位（见 tools.xlsx_save），作为中间文件时可用 stored。
+    executor: 批量处理时由调用方传入 create_executor() 创建的进程池，各输入文件共用，不再每个文件新建进程池。
+    """
     wb = load_workbook(input_path)
-    ws = wb.active
-    max_col = ws.max_column
+    model = SheetModel.from_worksheet(wb.active, _classify_row)
+    wb.close()
 
     # ===== 1. 找表头范围 =====
     header_starts = []
     header_ends = []
-    rows_list = list(ws.iter_rows(min_row=2))
 
-    for i, row in enumerate(rows_list):
-        row_idx = i + 2
-        text = _row_text(row)
-        if _is_header_end(text):
+    for row_idx in range(2, model.n_rows + 1):
+        if model.has_flag(row_idx, ROW_HEADER_END):
             header_ends.append(row_idx)
-        if i < len(rows_list) - 1:
-            if _is_header_start(text, _row_text(rows_list[i + 1])):
+        if row_idx < model.n_rows:
+            if model.has_flag(row_idx, ROW_COMPANY_1) and model.has_flag(row_idx + 1, ROW_COMPANY_2):
                 header_starts.append(row_idx)
 
     if not header_starts or not header_ends:
@@ -66,10 +128,10 @@ def split_excel_by_row(input_path, output_prefix, split_size=30):
 
     # 修正表头高度（合并单元格检测）
     max_merge_row = first_table_header_end
-    for merged in ws.merged_cells.ranges:
-        if merged.min_row <= first_table_header_end <= merged.max_row:
-            if merged.max_row > max_merge_row:
-                max_merge_row = merged.max_row
+    for m_min_row, _, m_max_row, _ in model.merges:
+        if m_min_row <= first_table_header_end <= m_max_row:
+            if m_max_row > max_merge_row:
+                max_merge_row = m_max_row
     first_table_header_end = max_merge_row
     header_ends[0] = max_merge_row
 
@@ -78,7 +140,7 @@ def split_excel_by_row(input_path, output_prefix, split_size=30):
     for i, header_start in enumerate(header_starts):
         header_end = header_ends[i] if i < len(header_ends) else header_start + 1
         table_start = 1 if i == 0 else header_start
-        table_end = header_starts[i + 1] - 2 if i < len(header_starts) - 1 else ws.max_row
+        table_end = header_starts[i + 1] - 2 if i < len(header_starts) - 1 else model.n_rows
         tables.append({'start': table_start, 'end': table_end, 'header_start': header_start, 'header_end': header_end})
 
     # ===== 3. 准备第一张表头行号 =====
@@ -92,46 +154,29 @@ def split_excel_by_row(input_path, output_prefix, split_size=30):
 
     # (省略部分辅助查找逻辑，保持原样)
     for r_search in range(tables[0]['header_start'], tables[0]['header_end'] + 1):
-        for c_idx, cell in enumerate(ws[r_search], 1):
-            if cell.value and "ITEM NO" in str(cell.value):
-                first_table_item_col = c_idx;
-                break
+        first_table_item_col = model.find_in_row(r_search, "ITEM NO")
         if first_table_item_col: break
 
     if first_table_item_col:
         data_start = tables[0]['header_end'] + 1
         footer_start = None
         for r in range(data_start, tables[0]['end'] + 1):
-            if "TOTAL" in _row_text(ws[r]): footer_start = r; break
+            if model.has_flag(r, ROW_TOTAL): footer_start = r; break
         end_row = footer_start - 1 if footer_start else tables[0]['end']
         for r in range(end_row, data_start - 1, -1):
             try:
-                val = ws.cell(r, first_table_item_col).value
+                val = model.value(r, first_table_item_col)
                 if val is not None: first_table_last_item_no = int(val); break
             except:
                 continue
 
-    output_files = []
     output_dir = os.path.dirname(output_prefix)
     if output_dir: os.makedirs(output_dir, exist_ok=True)
+    if output_prefix.endswith('.xlsx'): output_prefix = output_prefix[:-5]
 
+    # ===== 4. 规划每张子表要写入的源行 =====
+    plans = []
     for idx, table_info in enumerate(tables, 1):
-        new_wb = Workbook()
-        new_ws = new_wb.active
-        new_ws.page_margins = PageMargins(left=0, right=0, top=0, bottom=0, header=0.28, footer=0.12)
-
-        # ===== 强制锁定打印效果 =====
-        new_ws.page_setup.paperSize = new_ws.PAPERSIZE_A4  # 强制设为 A4 纸
-
-        # 核心设置：强制将所有列缩放到一页宽
-        # 这样即使对方打印机驱动有点偏差，Excel 也会自动微调比例让它刚好填满横向
-        new_ws.sheet_properties.pageSetUpPr.fitToPage = True
-        new_ws.page_setup.fitToHeight = 0  # 高度不限（随数据多少自动分页）
-        new_ws.page_setup.fitToWidth = 1  # 宽度强制为 1 页
-
-        # 让页面在打印时水平居中
-        new_ws.print_options.horizontalCentered = True
-
         # 确定原始表头的行号列表
         raw_header_rows = list(first_table_header_row_nums)
 
@@ -148,11 +193,8 @@ def split_excel_by_row(input_path, output_prefix, split_size=30):
         compressed_header_rows = []
         prev_blank = False
 
-        def is_blank_old_row(ws_obj, r_idx):
-            return all(ws_obj.cell(r_idx, c).value in (None, "") for c in range(1, ws_obj.max_column + 1))
-
         for r in rows_to_write:
-            if is_blank_old_row(ws, r):
+            if model.has_flag(r, ROW_BLANK):
                 if not prev_blank: compressed_header_rows.append(r)
                 prev_blank = True
             else:
@@ -169,210 +211,313 @@ def split_excel_by_row(input_path, output_prefix, split_size=30):
                 exp = first_table_last_item_no + 1
                 for r in range(table_info['header_start'], table_info['end'] + 1):
                     try:
-                        if ws.cell(r, first_table_item_col).value == exp:
+                        if model.value(r, first_table_item_col) == exp:
                             data_start_old_row = r;
                             break
                     except:
                         continue
         rows_to_write.extend(range(data_start_old_row, table_info['end'] + 1))
 
-        row_map = {}
-        new_r = 1
-
-        # ===== 逐行写入（样式修复版） =====
-        for old_r in rows_to_write:
-            if old_r in ws.row_dimensions:
-                new_ws.row_dimensions[new_r].height = ws.row_dimensions[old_r].height
-
-            # 判断当前是否是新表的第一行
-            is_new_first_row = (new_r == 1)
-
-            for c_idx in range(1, max_col + 1):
-                new_c = _get_new_col_idx(c_idx)
-
-                # 默认源单元格
-                source_cell = ws.cell(old_r, c_idx)
-
-                # [关键修复]：如果是新表第一行，且位于 A-C 列 (P&G 区域)
-                # 我们需要智能判断是取 Row 1 还是 Row 2 的内容和样式
-                if is_new_first_row and new_c <= 3:
-                    # 如果当前 Row 1 对应位置为空，且我们知道有 Row 2
-                    if not source_cell.value and original_row2_idx:
-                        # 尝试从 Row 2 取
-                        cell_row2 = ws.cell(original_row2_idx, c_idx)
-                        if cell_row2.value:
-                            source_cell = cell_row2  # !!! 切换源单元格为 Row 2
-
-                # 写入值
-                new_cell = new_ws.cell(row=new_r, column=new_c, value=source_cell.value)
-
-                # 复制样式 (使用封装函数)
-                copy_cell_style(source_cell, new_cell)
-
-                # 复制列宽
-                l_old = get_column_letter(c_idx)
-                l_new = get_column_letter(new_c)
-                if l_old in ws.column_dimensions:
-                    new_ws.column_dimensions[l_new].width = ws.column_dimensions[l_old].width
-
-            # 补齐 D 列宽度
-            if 'C' in ws.column_dimensions:
-                new_ws.column_dimensions['D'].width = ws.column_dimensions['C'].width
-
-            # -----------------------------------------------------
-            # 第一行特殊处理：右侧标题合并 (保留样式版)
-            # -----------------------------------------------------
-            if is_new_first_row:
-                # 1. 左侧 P&G 合并
-                new_ws.merge_cells(start_row=1, end_row=1, start_column=1, end_column=3)
-
-                # 2. 右侧长标题合并 (D列以后)
-                start_col = 4
-                end_col = new_ws.max_column
-
-                # 收集文本
-                parts = []
-                for c in range(start_col, end_col + 1):
-                    v = new_ws.cell(new_r, c).value
-                    if v: parts.append(str(v).strip())
-
-                if parts:
-                    merged_text = "  ".join(parts)
-                    target_cell = new_ws.cell(new_r, start_col)
-
-                    # 在覆盖值之前，确保 target_cell 拥有正确的样式
-                    # 通常 D列是空白的，样式可能在后面的列里。
-                    # 我们找到第一个有值的列作为样式源
-                    style_source_col = start_col
-                    for c in range(start_col, end_col + 1):
-                        if new_ws.cell(new_r, c).value:
-                            style_source_col = c;
-                            break
-
-                    # 复制该列的样式到 D 列 (target_cell)
-                    copy_cell_style(new_ws.cell(new_r, style_source_col), target_cell)
-
-                    target_cell.value = merged_text
-
-                    # 强制右对齐
-                    target_cell.alignment = Alignment(horizontal="right", vertical="center")
-
-                # 清空 D 列之后的内容防止重叠
-                for c in range(start_col + 1, end_col + 1):
-                    new_ws.cell(new_r, c).value = None
-
-                new_ws.merge_cells(start_row=new_r, end_row=new_r, start_column=start_col, end_column=end_col)
-
-            row_map[old_r] = new_r
-            new_r += 1
-
-        # ===== 处理原表合并单元格 =====
-        for merged in ws.merged_cells.ranges:
-            if merged.min_row in row_map and merged.max_row in row_map:
-                new_min_c = _get_new_col_idx(merged.min_col)
-                new_max_c = _get_new_col_idx(merged.max_col)
-                if merged.min_col == 2 and merged.max_col == 3: new_max_c = 4
-
-                # 避开我们已经处理过的第一行
-                if not (row_map[merged.min_row] == 1):
-                    new_ws.merge_cells(start_row=row_map[merged.min_row], end_row=row_map[merged.max_row],
-                                       start_column=new_min_c, end_column=new_max_c)
-
-        # ===== [关键修复] 字体放大逻辑 =====
-        # 使用 copy() 而不是 Font() 构造函数，以保留颜色
-        FONT_DELTA = 9
-        for r in range(1, 2):  # 只处理第一行
-            for c in range(1, new_ws.max_column + 1):
-                cell = new_ws.cell(row=r, column=c)
-                if cell.value:
-                    if cell.font:
-                        new_font = copy(cell.font)
-                        # 安全地增加大小
-                        new_font.size = (new_font.size if new_font.size else 11) + FONT_DELTA
-                        new_font.bold = True  # 确保加粗
-                        cell.font = new_font
-
-        # 行高设置
-        new_ws.row_dimensions[1].height = 36
-
-        def find_data_start_row(ws):
-            for r in range(1, ws.max_row + 1):
-                row_text = " ".join(str(c.value) for c in ws[r] if c.value)
-                if "ITEM NO" in row_text:
-                    return r + 1
-            raise ValueError("未找到 ITEM NO 行")
-
-        data_start_row = find_data_start_row(new_ws)
-        item_col_new = None
-        for r_h in range(1, find_data_start_row(new_ws) + 1):
-            for c_idx in range(1, new_ws.max_column + 1):
-                cell = new_ws.cell(r_h, c_idx)
-                if cell.value and "ITEM NO" in str(cell.value):
-                    item_col_new = c_idx
-                    break
-            if item_col_new: break
-
-        if item_col_new:
-            num = 1
-            footer_start_new_row = None
-            for r in range(new_ws.max_row, data_start_row, -1):
-                row_txt = "".join([str(c.value or "") for c in new_ws[r]])
-                if "TOTAL" in row_txt:
-                    footer_start_new_row = r
-                    break
-
-            data_end_row = footer_start_new_row - 1 if footer_start_new_row else new_ws.max_row
-
-            for r in range(data_start_row, data_end_row + 1):
-                v = new_ws.cell(r, item_col_new).value
-                if v is not None:
-                    new_ws.cell(r, item_col_new).value = num
-                    num += 1
-
-                # =========================================================
-                # [精准版] 表尾 TOTAL DAP 及其右侧数值加粗逻辑
-                # =========================================================
-                try:
-                    from openpyxl.styles import Font
-                    found_dap = False
-                    # 从最后 15 行向上扫描（表尾区域）
-                    for r in range(new_ws.max_row, max(1, new_ws.max_row - 15), -1):
-                        for c in range(1, new_ws.max_column + 1):
-                            cell = new_ws.cell(r, c)
-                            val_str = str(cell.value or "").strip().upper()
-
-                            # 匹配关键字
-                            if "TOTAL DAP" in val_str:
-                                # 1. 加粗关键字所在单元格
-                                cell.font = Font(bold=True, name=cell.font.name, size=cell.font.size,
-                                                 color=cell.font.color)
-
-                                # 2. 从当前列 (c) 开始向右查找第一个有数值的单元格
-                                for target_c in range(c + 1, new_ws.max_column + 1):
-                                    target_cell = new_ws.cell(r, target_c)
-                                    if target_cell.value is not None:
-                                        # 找到第一个非空单元格，执行加粗
-                                        target_cell.font = Font(bold=True, name=target_cell.font.name,
-                                                                size=target_cell.font.size,
-                                                                color=target_cell.font.color)
-                                        print(f"   -> 已加粗第 {r} 行的数值单元格: {get_column_letter(target_c)}{r}")
-                                        # 找到数值后通常这一行就处理完了，可以跳出
-                                        break
-
-                                found_dap = True
-                                break
-                        if found_dap: break
-                except Exception as e:
-                    print(f"   -> 加粗 TOTAL DAP 时出错: {e}")
-                # =========================================================
-
-        # 保存
         suffix = chr(64 + idx)
-        if output_prefix.endswith('.xlsx'): output_prefix = output_prefix[:-5]
         parts = output_prefix.rsplit(' ', 1)
         out_path = f"{parts[0]}{suffix} {parts[1]}.xlsx" if len(parts) == 2 else f"{output_prefix}{suffix}.xlsx"
-        new_wb.save(out_path)
-        output_files.append(out_path)
+        plans.append({'idx': idx, 'rows': rows_to_write, 'row2': original_row2_idx, 'out_path': out_path,
+                      'compression': compression})
+
+    # ===== 5. 各子表串行或并行生成 =====
+    if workers is None:
+        cpu_count = os.cpu_count() or 1
+        if executor is not None:
+            parallel = len(plans) >= 2
+        else:
+            parallel = sum(len(plan['rows']) for plan in plans) >= PARALLEL_MIN_ROWS
+        workers = cpu_count if parallel and cpu_count > 1 else 1
+    workers = max(1, min(workers, len(plans)))
+
+    if workers == 1:
+        output_files = [_write_table(model, plan) for plan in plans]
+    else:
+        output_files = _write_tables_parallel(model, plans, workers, executor)
+
+    for out_path in output_files:
         print(f"✅ {out_path} (样式修复完成)")
 
-    return output_files
\ No newline at end of file
+    return output_files
+
+
+def _write_tables_parallel(model, plans, workers, executor=None):
+    """源数据快照（SheetModel）只序列化一次写入临时文件，各子进程按路径读取并缓存"""
+    fd, snapshot_path = tempfile.mkstemp(suffix=".snapshot", dir=os.path.dirname(os.path.abspath(plans[0]['out_path'])))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        if executor is not None:
+            return list(executor.map(_write_table_in_worker, [snapshot_path] * len(plans), plans))
+        with create_executor(workers) as pool:
+            return list(pool.map(_write_table_in_worker, [snapshot_path] * len(plans), plans))
+    finally:
+        os.remove(snapshot_path)
+
+
+def _plan_renumber(snap, rows_to_write):
+    """
+    在模型上完成数据区定位、表尾检测和序号重排（新表第 n 行对应 rows_to_write[n - 1]）。
+    返回 (item_col, item_numbers, dap_cells)：
+    item_col 为源表 ITEM NO 列；item_numbers 为 {新行号: 新序号}；
+    dap_cells 为需要加粗的 TOTAL DAP 单元格 [(新行号, 新列号), ...]。
+    """
+    n_new_rows = len(rows_to_write)
+
+    data_start_row = None
+    for pos, old_r in enumerate(rows_to_write, 1):
+        if snap.has_flag(old_r, ROW_ITEM_NO):
+            data_start_row = pos + 1
+            break
+    if data_start_row is None:
+        raise ValueError("未找到 ITEM NO 行")
+
+    item_col = None
+    for old_r in rows_to_write[:data_start_row]:
+        item_col = snap.find_in_row(old_r, "ITEM NO")
+        if item_col: break
+
+    item_numbers = {}
+    dap_cells = []
+    if not item_col:
+        return item_col, item_numbers, dap_cells
+
+    footer_start_new_row = None
+    for pos in range(n_new_rows, data_start_row, -1):
+        if snap.has_flag(rows_to_write[pos - 1], ROW_TOTAL):
+            footer_start_new_row = pos
+            break
+    data_end_row = footer_start_new_row - 1 if footer_start_new_row else n_new_rows
+
+    num = 1
+    for pos in range(data_start_row, data_end_row + 1):
+        if snap.value(rows_to_write[pos - 1], item_col) is not None:
+            item_numbers[pos] = num
+            num += 1
+
+    # 表尾 TOTAL DAP：从最后 15 行向上找关键字，连同其右侧第一个非空单元格一起加粗
+    if data_start_row <= data_end_row:
+        for pos in range(n_new_rows, max(1, n_new_rows - 15), -1):
+            old_r = rows_to_write[pos - 1]
+            if not snap.has_flag(old_r, ROW_TOTAL_DAP):
+                continue
+            c = snap.find_in_row(old_r, "TOTAL DAP", upper=True)
+            dap_cells.append((pos, _get_new_col_idx(c)))
+            for target_c in range(c + 1, snap.n_cols + 1):
+                if snap.value(old_r, target_c) is not None:
+                    dap_cells.append((pos, _get_new_col_idx(target_c)))
+                    break
+            break
+
+    return item_col, item_numbers, dap_cells
+
+
+def _write_table(snap, plan):
+    """根据快照生成并保存一张子表，返回输出路径"""
+    max_col = snap.n_cols
+    rows_to_write = plan['rows']
+    original_row2_idx = plan['row2']
+    item_col, item_numbers, dap_cells = _plan_renumber(snap, rows_to_write)
+    style_cache = {}
+
+    new_wb = Workbook()
+    new_ws = new_wb.active
+    new_ws.page_margins = PageMargins(left=0, right=0, top=0, bottom=0, header=0.28, footer=0.12)
+
+    # ===== 强制锁定打印效果 =====
+    new_ws.page_setup.paperSize = new_ws.PAPERSIZE_A4  # 强制设为 A4 纸
+
+    # 核心设置：强制将所有列缩放到一页宽
+    # 这样即使对方打印机驱动有点偏差，Excel 也会自动微调比例让它刚好填满横向
+    new_ws.sheet_properties.pageSetUpPr.fitToPage = True
+    new_ws.page_setup.fitToHeight = 0  # 高度不限（随数据多少自动分页）
+    new_ws.page_setup.fitToWidth = 1  # 宽度强制为 1 页
+
+    # 让页面在打印时水平居中
+    new_ws.print_options.horizontalCentered = True
+
+    row_map = {}
+    new_r = 1
+
+    # ===== 逐行写入（样式修复版） =====
+    for old_r in rows_to_write:
+        height = snap.height(old_r)
+        if height is not None:
+            new_ws.row_dimensions[new_r].height = height
+
+        # 判断当前是否是新表的第一行
+        is_new_first_row = (new_r == 1)
+
+        for c_idx in range(1, max_col + 1):
+            new_c = _get_new_col_idx(c_idx)
+
+            # 默认源单元格
+            source_r = old_r
+            source_value = snap.value(old_r, c_idx)
+
+            # [关键修复]：如果是新表第一行，且位于 A-C 列 (P&G 区域)
+            # 我们需要智能判断是取 Row 1 还是 Row 2 的内容和样式
+            if is_new_first_row and new_c <= 3:
+                # 如果当前 Row 1 对应位置为空，且我们知道有 Row 2
+                if not source_value and original_row2_idx:
+                    # 尝试从 Row 2 取
+                    value_row2 = snap.value(original_row2_idx, c_idx)
+                    if value_row2:
+                        source_r, source_value = original_row2_idx, value_row2  # !!! 切换源单元格为 Row 2
+
+            # 序号列写入重排后的序号
+            if c_idx == item_col and new_r in item_numbers:
+                source_value = item_numbers[new_r]
+
+            # 写入值
+            new_cell = new_ws.cell(row=new_r, column=new_c, value=source_value)
+
+            # 复制样式 (快照版 copy_cell_style)
+            snap.apply_style(source_r, c_idx, new_cell, style_cache)
+
+            # 复制列宽
+            l_old = get_column_letter(c_idx)
+            l_new = get_column_letter(new_c)
+            if l_old in snap.col_widths:
+                new_ws.column_dimensions[l_new].width = snap.col_widths[l_old]
+
+        # 补齐 D 列宽度
+        if 'C' in snap.col_widths:
+            new_ws.column_dimensions['D'].width = snap.col_widths['C']
+
+        # -----------------------------------------------------
+        # 第一行特殊处理：右侧标题合并 (保留样式版)
+        # -----------------------------------------------------
+        if is_new_first_row:
+            # 1. 左侧 P&G 合并
+            new_ws.merge_cells(start_row=1, end_row=1, start_column=1, end_column=3)
+
+            # 2. 右侧长标题合并 (D列以后)
+            start_col = 4
+            end_col = new_ws.max_column
+
+            # 收集文本
+            parts = []
+            for c in range(start_col, end_col + 1):
+                v = new_ws.cell(new_r, c).value
+                if v: parts.append(str(v).strip())
+
+            if parts:
+                merged_text = "  ".join(parts)
+                target_cell = new_ws.cell(new_r, start_col)
+
+                # 在覆盖值之前，确保 target_cell 拥有正确的样式
+                # 通常 D列是空白的，样式可能在后面的列里。
+                # 我们找到第一个有值的列作为样式源
+                style_source_col = start_col
+                for c in range(start_col, end_col + 1):
+                    if new_ws.cell(new_r, c).value:
+                        style_source_col = c;
+                        break
+
+                # 复制该列的样式到 D 列 (target_cell)
+                copy_cell_style(new_ws.cell(new_r, style_source_col), target_cell)
+
+                target_cell.value = merged_text
+
+                # 强制右对齐
+                target_cell.alignment = Alignment(horizontal="right", vertical="center")
+
+            # 清空 D 列之后的内容防止重叠
+            for c in range(start_col + 1, end_col + 1):
+                new_ws.cell(new_r, c).value = None
+
+            new_ws.merge_cells(start_row=new_r, end_row=new_r, start_column=start_col, end_column=end_col)
+
+        row_map[old_r] = new_r
+        new_r += 1
+
+    # ===== 处理原表合并单元格 =====
+    for m_min_row, m_min_col, m_max_row, m_max_col in snap.merges:
+        if m_min_row in row_map and m_max_row in row_map:
+            new_min_c = _get_new_col_idx(m_min_col)
+            new_max_c = _get_new_col_idx(m_max_col)
+            if m_min_col == 2 and m_max_col == 3: new_max_c = 4
+
+            # 避开我们已经处理过的第一行
+            if not (row_map[m_min_row] == 1):
+                new_ws.merge_cells(start_row=row_map[m_min_row], end_row=row_map[m_max_row],
+                                   start_column=new_min_c, end_column=new_max_c)
+
+    # ===== [关键修复] 字体放大逻辑 =====
+    # 使用 copy() 而不是 Font() 构造函数，以保留颜色
+    FONT_DELTA = 9
+    for r in range(1, 2):  # 只处理第一行
+        for c in range(1, new_ws.max_column + 1):
+            cell = new_ws.cell(row=r, column=c)
+            if cell.value:
+                if cell.font:
+                    new_font = copy(cell.font)
+                    # 安全地增加大小
+                    new_font.size = (new_font.size if new_font.size else 11) + FONT_DELTA
+                    new_font.bold = True  # 确保加粗
+                    cell.font = new_font
+
+    # 行高设置
+    new_ws.row_dimensions[1].height = 36
+
+    # =========================================================
+    # [精准版] 表尾 TOTAL DAP 及其右侧数值加粗逻辑
+    # =========================================================
+    try:
+        for r, c in dap_cells:
+            cell = new_ws.cell(r, c)
+            cell.font = Font(bold=True, name=cell.font.name, size=cell.font.size, color=cell.font.color)
+        if len(dap_cells) == 2:
+            r, c = dap_cells[1]
+            print(f"   -> 已加粗第 {r} 行的数值单元格: {get_column_letter(c)}{r}")
+    except Exception as e:
+        print(f"   -> 加粗 TOTAL DAP 时出错: {e}")
+    # =========================================================
+
+    # 保存
+    out_path = plan['out_path']
+    save_workbook(new_wb, out_path, plan['compression'])
+    return out_path
+
+
+def _benchmark(input_path, worker_counts=(2, 4), repeat=3):
+    """
+    对比串行、每个文件新建进程池、整批共用进程池三种方式的拆分耗时（取 repeat 次平均）。
+    共用进程池预先拉起进程，对应 GUI 批处理中第二个及之后的输入文件。
+    """
+    import contextlib
+    import io
+
+    def timed(**kwargs):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            with contextlib.redirect_stdout(io.StringIO()):
+                files = split_excel_by_row(input_path, os.path.join(tmp, "out"), **kwargs)
+        return (time.perf_counter() - start) / repeat, len(files)
+
+    print(f"文件: {os.path.basename(input_path)}  CPU 核数: {os.cpu_count()}  重复: {repeat}")
+    with tempfile.TemporaryDirectory() as tmp:
+        serial, n_tables = timed(workers=1)
+        print(f"  串行        {serial:7.2f} s  （{n_tables} 张子表，每张 {serial / n_tables * 1000:.0f} ms）")
+        for workers in worker_counts:
+            fresh, _ = timed(workers=workers)
+            pool = create_executor(workers)
+            try:
+                for future in [pool.submit(os.getpid) for _ in range(workers * 4)]:
+                    future.result()
+                shared, _ = timed(workers=workers, executor=pool)
+            finally:
+                pool.shutdown()
+            print(f"  {workers} 进程 新建池 {fresh:7.2f} s  加速 {serial / fresh:4.2f}x   "
+                  f"共用池 {shared:7.2f} s  加速 {serial / shared:4.2f}x")
+
+
+if __name__ == "__main__":
+    # 用法: python -m tools.splitter1 <file.xlsx> [进程数 ...]
+    multiprocessing.freeze_support()
+    _benchmark(sys.argv[1], tuple(int(n) for n in sys.argv[2:]) or (2, 4))
@@ -1,9 +1,44 @@
 import os
+from io import BytesIO
 import openpyxl
 from openpyxl.drawing.image import Image
+from openpyxl.utils import get_column_letter
+from tools.xlsx_save import save_workbook, COMPRESSION_FINAL
 
+# 印章图片缓存：{路径: (修改时间, 图片字节)}，常驻进程里同一张印章只读一次
+_STAMP_CACHE = {}
 
-def add_stamp_to_excel(file_path, stamp_image_path):
+
+def load_stamp(stamp_image_path):
+    """读取并缓存印章图片；图片文件被替换（修改时间变化）后自动重新读取"""
+    mtime = os.path.getmtime(stamp_image_path)
+    cached = _STAMP_CACHE.get(stamp_image_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(stamp_image_path, "rb") as f:
+        data = f.read()
+    Image(BytesIO(data))  # 提前解析一次，图片损坏时在这里就报错
+    _STAMP_CACHE[stamp_image_path] = (mtime, data)
+    return data
+
+
+def _find_stamp(ws, stamp_data):
+    """
+    查找已经盖上的同一枚印章，返回锚点单元格（如 "E30"），没有返回 None。
+    openpyxl 加载时会保留文件中已有的图片，图片内容就是原始字节，可以直接比较。
+    """
+    for img in ws._images:
+        # 用 getvalue() 比较，不能调用 img._data()：它会关闭图片数据流，之后就无法保存
+        if isinstance(img.ref, BytesIO) and img.ref.getvalue() == stamp_data:
+            marker = getattr(img.anchor, "_from", None)
+            if marker is None:
+                return str(img.anchor)
+            return f"{get_column_letter(marker.col + 1)}{marker.row + 1}"
+    return None
+
+
+def add_stamp_to_excel(file_path, stamp_image_path, compression=COMPRESSION_FINAL):
     try:
         if not os.path.exists(stamp_image_path):
             return False, f"找不到图片文件: {stamp_image_path}"
@@ -12,6 +47,13 @@ def add_stamp_to_excel(file_path, stamp_image_path):
         wb = openpyxl.load_workbook(file_path)
         try:
             ws = wb.active
+            stamp_data = load_stamp(stamp_image_path)
+
+            # 盖章后、记录完成前程序中断时会重新执行，已有同一枚印章就不再叠加第二个
+            existing = _find_stamp(ws, stamp_data)
+            if existing:
+                return True, f"已有印章，跳过({existing})"
+
             # 寻找最后一行
             last_row = 1
             for r in range(ws.max_row, 0, -1):
@@ -19,7 +61,7 @@ def add_stamp_to_excel(file_path, stamp_image_path):
                     last_row = r
                     break
 
-            img = Image(stamp_image_path)
+            img = Image(BytesIO(stamp_data))
             img.width, img.height = 180, 126
 
             # 增加安全边距判断，防止行号为负数
@@ -27,7 +69,7 @@ def add_stamp_to_excel(file_path, stamp_image_path):
             anchor_cell = f"E{target_row}"
 
             ws.add_image(img, anchor_cell)
-            wb.save(file_path)
+            save_workbook(wb, file_path, compression)
             return True, f"盖章成功({anchor_cell})"
         finally:
             wb.close()  # 确保在 save 之后或出错后都能关闭
@@ -0,0 +1,274 @@
+import os
+import sys
+import numpy as np
+import openpyxl
+from tools.xlsx_save import save_workbook, COMPRESSION_FINAL
+
+# === 关键字配置 ===
+HEADER_KEY = "ITEM NO"
+# 需要汇总的列：{列名: 表头关键字}
+SUM_COLUMN_KEYS = {
+    "QTY": ("QTY", "QUANTITY"),
+    "AMOUNT": ("AMOUNT",),
+}
+AMOUNT_KEY = "AMOUNT"
+FOOTER_KEY = "TOTAL"
+DAP_KEY = "TOTAL DAP"
+
+# 表尾数值与重算结果的允许误差（金额按分计）
+TOLERANCE = 0.005
+
+_cell_type = np.frompyfunc(type, 1, 1)
+
+
+def _row_upper(row):
+    return " ".join(str(v).strip().upper() for v in row if v is not None)
+
+
+def _numeric_column(block, col):
+    """从 object 二维数组中取出一列，返回 (float 数组, 数值掩码)；文本 / 空值 / 布尔 不计入"""
+    column = block[:, col]
+    types = _cell_type(column)
+    mask = (types == int) | (types == float)
+    values = np.zeros(len(column))
+    values[mask] = column[mask].astype(float)
+    return values, mask
+
+
+def _is_number(v):
+    return type(v) in (int, float)
+
+
+def _is_value(v):
+    return _is_number(v) or (isinstance(v, str) and v.startswith("="))
+
+
+def _footer_label(row):
+    """
+    判断是否为表尾行：第一个以 TOTAL 开头的文本单元格即标签。
+    返回 (FOOTER_KEY | DAP_KEY | None, 标签列下标)；"TOTAL" 和 "DAP" 分在相邻两格时同样算 TOTAL DAP
+    """
+    for c, v in enumerate(row):
+        if not isinstance(v, str):
+            continue
+        text = v.strip().upper()
+        if not text.startswith(FOOTER_KEY):
+            continue
+        if text.startswith(DAP_KEY):
+            return DAP_KEY, c
+        following = next((str(x).strip().upper() for x in row[c + 1:] if x is not None), "")
+        if text == FOOTER_KEY and following.startswith("DAP"):
+            return DAP_KEY, c
+        return FOOTER_KEY, c
+    return None, None
+
+
+def _find_layout(rows):
+    """
+    定位表头行、汇总列和表尾行（均为 0 起始下标）。
+    返回 dict：header / columns {列名: 列下标} / footer / total / dap / dap_col，找不到的为 None
+    """
+    layout = {"header": None, "columns": {}, "footer": None, "total": None, "dap": None, "dap_col": None}
+
+    for i, row in enumerate(rows):
+        if HEADER_KEY in _row_upper(row):
+            layout["header"] = i
+            break
+    if layout["header"] is None:
+        return layout
+
+    # 表头可能占两行（第二行为单位等），两行都找
+    header = layout["header"]
+    for row in rows[header:header + 2]:
+        for c, v in enumerate(row):
+            if v is None:
+                continue
+            text = str(v).upper()
+            for name, keys in SUM_COLUMN_KEYS.items():
+                if name not in layout["columns"] and any(k in text for k in keys):
+                    layout["columns"][name] = c
+
+    # 从表尾往上找：品名里也可能出现 TOTAL（如 "OLAY TOTAL EFFECTS"），只认以 TOTAL 开头的标签单元格
+    for i in range(len(rows) - 1, header, -1):
+        kind, label_col = _footer_label(rows[i])
+        if kind == DAP_KEY and layout["dap"] is None:
+            layout["dap"], dap_label_col = i, label_col
+        elif kind == FOOTER_KEY and layout["total"] is None:
+            layout["total"] = i
+        if layout["total"] is not None and layout["dap"] is not None:
+            break
+    footers = [i for i in (layout["total"], layout["dap"]) if i is not None]
+    layout["footer"] = min(footers) if footers else None
+
+    # TOTAL DAP 的数值：优先取金额列，否则取标签右侧第一个数值 / 公式单元格
+    if layout["dap"] is not None:
+        row = rows[layout["dap"]]
+        amount_col = layout["columns"].get(AMOUNT_KEY)
+        if amount_col is not None and amount_col < len(row) and row[amount_col] is not None:
+            layout["dap_col"] = amount_col
+        else:
+            layout["dap_col"] = next((c for c in range(dap_label_col + 1, len(row)) if _is_value(row[c])), None)
+    return layout
+
+
+def _compare(label, computed, footer_value, mismatches):
+    """返回核对状态：ok / mismatch / formula / missing"""
+    if footer_value is None:
+        return "missing"
+    if isinstance(footer_value, str) and footer_value.startswith("="):
+        mismatches.append(f"{label}: 表尾为公式 {footer_value}，无法核对（重算值 {computed:,.2f}）")
+        return "formula"
+    if not _is_number(footer_value):
+        return "missing"
+    if abs(footer_value - computed) > TOLERANCE:
+        mismatches.append(f"{label}: 表尾 {footer_value:,.2f} ≠ 重算 {computed:,.2f}（差 {footer_value - computed:,.2f}）")
+        return "mismatch"
+    return "ok"
+
+
+def _write_value(ws, row_idx, col_idx, value):
+    cell = ws.cell(row_idx + 1, col_idx + 1)
+    value = float(np.round(value, 2))
+    cell.value = int(value) if value.is_integer() else value
+
+
+def _read_table(file_path):
+    """读取一张子表：向量化求和，并记下表尾单元格 {标签: (行下标, 列下标, 值, 对应的汇总列)}"""
+    wb = openpyxl.load_workbook(file_path, read_only=True)
+    try:
+        rows = list(wb.active.iter_rows(values_only=True))
+    finally:
+        wb.close()
+
+    layout = _find_layout(rows)
+    table = {"file": file_path, "sums": dict.fromkeys(SUM_COLUMN_KEYS, 0.0), "rows": 0,
+             "found": layout["header"] is not None and bool(layout["columns"]), "footer": {}, "status": {}}
+    if not table["found"]:
+        return table
+
+    data_end = layout["footer"] if layout["footer"] is not None else len(rows)
+    data = rows[layout["header"] + 1:data_end]
+    if data:
+        width = max(len(r) for r in data)
+        block = np.array([r + (None,) * (width - len(r)) for r in data], dtype=object)
+        table["rows"] = len(block)
+        for name, col in layout["columns"].items():
+            if col < width:
+                values, mask = _numeric_column(block, col)
+                table["sums"][name] = float(values[mask].sum())
+
+    cells = []
+    if layout["total"] is not None:
+        cells += [(name, layout["total"], col, name) for name, col in layout["columns"].items()]
+    if layout["dap"] is not None and layout["dap_col"] is not None and AMOUNT_KEY in layout["columns"]:
+        cells.append((DAP_KEY, layout["dap"], layout["dap_col"], AMOUNT_KEY))
+    for label, row_idx, col, name in cells:
+        row = rows[row_idx]
+        table["footer"][label] = (row_idx, col, row[col] if col < len(row) else None, name)
+    return table
+
+
+def check_table_totals(file_paths, write=False, compression=COMPRESSION_FINAL):
+    """
+    重算拆分后各子表的数量 / 金额合计，并与 TOTAL、TOTAL DAP 表尾核对。
+    - 每张表一次读出全部行，数值列转成 NumPy 数组后向量化求和
+    - 每张表都有 TOTAL 时逐表核对，总计再与各表 TOTAL 之和核对；
+      否则视为整单只有一个合计，最后一张表的表尾与总计核对，其余表尾与本表合计核对
+    - write=True 时把重算结果写入不一致（或为公式）的表尾单元格
+    返回 (是否全部一致, 摘要信息, 报告 dict)
+    """
+    names = list(SUM_COLUMN_KEYS)
+    mismatches = []
+    tables = [_read_table(f) for f in file_paths]
+
+    sums = np.array([[t["sums"][n] for n in names] for t in tables]) if tables else np.zeros((0, len(names)))
+    grand = dict(zip(names, sums.sum(axis=0).tolist()))
+
+    per_table = all(any(n in t["footer"] for n in names) for t in tables)
+    fixes = {}
+    for i, table in enumerate(tables):
+        f_name = os.path.basename(table["file"])
+        if not table["found"]:
+            mismatches.append(f"{f_name}: 未找到 {HEADER_KEY} 表头或数量/金额列")
+            continue
+        expected = grand if not per_table and i == len(tables) - 1 else table["sums"]
+        for label, (row_idx, col, value, name) in table["footer"].items():
+            status = _compare(f"{f_name} {label}", expected[name], value, mismatches)
+            table["status"][label] = status
+            if status in ("mismatch", "formula"):
+                fixes.setdefault(table["file"], []).append((row_idx, col, expected[name]))
+
+    grand_status = {}
+    if per_table and tables:
+        for name in names:
+            footers = [t["footer"].get(name, (None, None, None))[2] for t in tables]
+            if all(_is_number(v) for v in footers):
+                source_total = float(np.sum(np.array(footers, dtype=float)))
+                grand_status[name] = _compare(f"总计 {name}", grand[name], source_total, mismatches)
+
+    if write:
+        for file_path, cells in fixes.items():
+            wb = openpyxl.load_workbook(file_path)
+            try:
+                for row_idx, col, value in cells:
+                    _write_value(wb.active, row_idx, col, value)
+                save_workbook(wb, file_path, compression)
+            finally:
+                wb.close()
+
+    ok = not mismatches
+    summary = "  ".join(f"{name} {grand[name]:,.2f}" for name in names)
+    msg = f"{len(tables)} 张表 总计 {summary}" + ("，全部一致" if ok else f"，{len(mismatches)} 处不一致")
+    if write and fixes:
+        msg += f"，已写入 {sum(len(c) for c in fixes.values())} 个表尾单元格"
+    report = {"tables": tables, "grand": grand, "grand_status": grand_status, "mismatches": mismatches}
+    return ok, msg, report
+
+
+# ========= 表尾定位的回归用例：(说明, 行数据, 期望的 total / dap / footer / dap_col) =========
+_LAYOUT_CASES = [
+    ("品名含 TOTAL 不算表尾",
+     [("ITEM NO.", "DESC", "QTY", "AMOUNT"),
+      (1, "OLAY TOTAL EFFECTS 50G", 2, 3.0),
+      (2, "SOAP", 4, 4.0),
+      ("TOTAL", None, 6, 7.0)],
+     {"total": 3, "dap": None, "footer": 3, "dap_col": None}),
+    ("TOTAL 与 DAP 分在两格",
+     [("ITEM NO.", "QTY", "AMOUNT"),
+      (1, 2, 3.5),
+      ("TOTAL", 2, 3.5),
+      ("TOTAL", "DAP", None, 99)],
+     {"total": 2, "dap": 3, "footer": 2, "dap_col": 3}),
+    ("TOTAL DAP 在金额列",
+     [("ITEM NO.", "QTY", "AMOUNT"),
+      (1, 2, 3.5),
+      ("TOTAL", 2, 3.5),
+      ("TOTAL DAP:", None, 3.5)],
+     {"total": 2, "dap": 3, "footer": 2, "dap_col": 2}),
+]
+
+
+def _self_check():
+    failed = 0
+    for name, rows, expected in _LAYOUT_CASES:
+        layout = _find_layout(rows)
+        actual = {key: layout[key] for key in expected}
+        if actual != expected:
+            failed += 1
+            print(f"❌ {name}: 期望 {expected}，实际 {actual}")
+        else:
+            print(f"✅ {name}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    # 用法: python -m tools.totals4 [file.xlsx ...]
+    # 不带参数时运行表尾定位的回归用例；带文件时打印核对结果（只读，不改写）
+    if len(sys.argv) > 1:
+        ok, msg, report = check_table_totals(sys.argv[1:])
+        print(msg)
+        for mismatch in report["mismatches"]:
+            print(f"   └─ {mismatch}")
+    else:
+        ok = _self_check()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,421 @@
+import json
+import os
+import queue
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+import openpyxl  # noqa: F401  子进程导入本模块时即完成 openpyxl 的加载
+from tools.splitter1 import split_excel_by_row, pool_context
+from tools.writer2 import set_smart_print_titles
+from tools.stamper3 import add_stamp_to_excel, load_stamp
+from tools.xlsx_save import COMPRESSION_STORED, COMPRESSION_FINAL
+
+try:
+    # 可选依赖：有 watchdog 时用系统文件通知（Linux 下为 inotify），否则轮询目录
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+# ========= 收件目录下的子目录 =========
+PROCESSING_DIR = "_processing"
+DONE_DIR = "_done"
+FAILED_DIR = "_failed"
+METRICS_FILE = "_watch_metrics.json"
+
+# 即使有文件通知也定期全量扫描一次（共享盘上的通知不可靠）
+FULL_SCAN_INTERVAL = 10.0
+# 文件已不再变化但始终不是完整的 xlsx，超过该秒数后视为损坏
+INCOMPLETE_TIMEOUT = 60.0
+
+
+def _is_candidate(name):
+    # 跳过 Excel 的锁文件 ~$xxx.xlsx 以及保存中的临时文件
+    return name.lower().endswith(".xlsx") and not name.startswith(("~$", "."))
+
+
+def _unique_path(directory, name):
+    """目标目录下已有同名文件时追加时间戳"""
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        return path
+    stem, ext = os.path.splitext(name)
+    return os.path.join(directory, f"{stem}_{time.strftime('%Y%m%d_%H%M%S')}_{time.time_ns() % 1000000}{ext}")
+
+
+# ========= 子进程 =========
+def _warm_worker(stamp_path):
+    """进程池 initializer：提前读取印章，后续任务直接复用"""
+    # Ctrl+C 只由主进程处理，子进程把手上的文件做完
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    load_stamp(stamp_path)
+
+
+def _process_file(input_path, outbox, stamp_path):
+    """
+    在子进程中对一个输入文件执行 拆分 → 表头 → 盖章，成功的结果移动到 outbox。
+    返回 {"outputs": [...], "errors": [...], "timings": [(阶段, 秒数), ...]}
+    """
+    work_dir = tempfile.mkdtemp(prefix="excel_watch_")
+    result = {"outputs": [], "errors": [], "timings": []}
+    try:
+        input_filename = os.path.splitext(os.path.basename(input_path))[0]
+
+        t0 = time.perf_counter()
+        # 外层进程池已经按文件并行，这里不再开子进程
+        split_files = split_excel_by_row(input_path, os.path.join(work_dir, input_filename),
+                                         workers=1, compression=COMPRESSION_STORED)
+        result["timings"].append(("拆分", time.perf_counter() - t0))
+        if not split_files:
+            result["errors"].append("未生成任何拆分文件")
+            return result
+
+        t_header = t_stamp = 0.0
+        for file_path in split_files:
+            t0 = time.perf_counter()
+            ok_h, msg_h = set_smart_print_titles(file_path, compression=COMPRESSION_STORED)
+            t_header += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            ok_s, msg_s = add_stamp_to_excel(file_path, stamp_path, compression=COMPRESSION_FINAL)
+            t_stamp += time.perf_counter() - t0
+
+            if not (ok_h and ok_s):
+                result["errors"].append(f"{os.path.basename(file_path)} 表头: {msg_h} | 印章: {msg_s}")
+        result["timings"] += [("表头", t_header), ("印章", t_stamp)]
+
+        if not result["errors"]:
+            for file_path in split_files:
+                dest = _unique_path(outbox, os.path.basename(file_path))
+                shutil.move(file_path, dest)
+                result["outputs"].append(dest)
+        return result
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+# ========= 主进程 =========
+class WatchMetrics:
+    """吞吐量与队列指标"""
+
+    def __init__(self, window=200):
+        self.started = time.time()
+        self.detected = 0
+        self.completed = 0
+        self.failed = 0
+        self.outputs = 0
+        self._latencies = deque(maxlen=window)
+        self._finish_times = deque(maxlen=window)
+
+    def record_done(self, latency, ok, n_outputs):
+        if ok:
+            self.completed += 1
+            self.outputs += n_outputs
+        else:
+            self.failed += 1
+        self._latencies.append(latency)
+        self._finish_times.append(time.time())
+
+    def snapshot(self, waiting, in_flight):
+        latencies = sorted(self._latencies)
+        now = time.time()
+        last_minute = sum(1 for t in self._finish_times if now - t <= 60)
+        return {
+            "uptime_s": round(now - self.started, 1),
+            "detected": self.detected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "outputs": self.outputs,
+            "waiting": waiting,
+            "in_flight": in_flight,
+            "files_per_min_last_minute": last_minute,
+            "latency_avg_s": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "latency_p95_s": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3)
+            if latencies else None,
+        }
+
+
+class _EventHandler(FileSystemEventHandler if Observer else object):
+    def __init__(self, events):
+        super().__init__()
+        self._events = events
+
+    def on_created(self, event):
+        if not event.is_directory: self._events.put(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory: self._events.put(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory: self._events.put(event.dest_path)
+
+
+class HotFolderService:
+    """
+    监听收件目录，新 .xlsx 写入完成后交给常驻进程池处理：
+    - 文件大小/修改时间在 settle 秒内不再变化，且是完整的 zip 才认为写入完成
+    - 开始处理前移入 _processing，成功后移入 _done，失败移入 _failed
+    - 结果文件放入 outbox，指标定期写入收件目录下的 _watch_metrics.json
+    """
+
+    def __init__(self, inbox, outbox, stamp_path, workers=None, settle=0.5, poll_interval=0.1,
+                 metrics_interval=5.0, use_watchdog=True):
+        self.inbox = os.path.abspath(inbox)
+        self.outbox = os.path.abspath(outbox)
+        self.stamp_path = os.path.abspath(stamp_path)
+        self.workers = workers or os.cpu_count() or 1
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.metrics_interval = metrics_interval
+        self.use_watchdog = use_watchdog and Observer is not None
+        self.metrics = WatchMetrics()
+
+        # {路径: (大小, 修改时间, 最近一次变化的时间)}
+        self._candidates = {}
+        self._events = queue.Queue()
+        # {future: (原文件名, 处理中路径, 就绪时间, 是否可疑)}
+        self._in_flight = {}
+        # 进程池崩溃后放回的文件，优先重新提交：[(原文件名, 处理中路径, 就绪时间, 是否可疑)]
+        self._retry = deque()
+        self._pool = None
+        self._stopping = False
+
+        for d in (self.outbox, *self._sub_dirs()):
+            os.makedirs(d, exist_ok=True)
+
+    def _sub_dirs(self):
+        return [os.path.join(self.inbox, d) for d in (PROCESSING_DIR, DONE_DIR, FAILED_DIR)]
+
+    def stop(self):
+        self._stopping = True
+
+    def _on_signal(self, signum, frame):
+        # SIGINT / SIGTERM（服务管理器停止服务）都先把处理中的文件做完再退出；再收到一次则立即退出
+        if self._stopping:
+            raise KeyboardInterrupt
+        print(f"⏹️ 收到退出信号({signal.Signals(signum).name})，等待处理中的文件完成...")
+        self.stop()
+
+    def run(self):
+        if not os.path.exists(self.stamp_path):
+            raise FileNotFoundError(f"找不到图片文件: {self.stamp_path}")
+
+        # 信号处理只能在主线程里设置（测试等场景下 run() 可能跑在子线程里，由调用方 stop()）
+        old_handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                old_handlers[signum] = signal.signal(signum, self._on_signal)
+
+        # 上次异常退出时留在 _processing 里的文件放回收件目录重新处理
+        processing_dir = os.path.join(self.inbox, PROCESSING_DIR)
+        for name in os.listdir(processing_dir):
+            os.replace(os.path.join(processing_dir, name), _unique_path(self.inbox, name))
+
+        # 先启动进程池再启动文件通知线程
+        self._start_pool()
+        observer = None
+        if self.use_watchdog:
+            observer = Observer()
+            observer.schedule(_EventHandler(self._events), self.inbox, recursive=False)
+            observer.start()
+        print(f"👀 监听 {self.inbox} → {self.outbox}（{'文件通知' if observer else '轮询'}，{self.workers} 个进程）")
+
+        last_full_scan = 0.0
+        last_metrics = time.time()
+        try:
+            while not self._stopping:
+                now = time.time()
+                if observer is None or now - last_full_scan >= FULL_SCAN_INTERVAL:
+                    self._full_scan()
+                    last_full_scan = now
+                self._drain_events()
+                self._dispatch_ready()
+                self._collect_done(timeout=self.poll_interval)
+                if time.time() - last_metrics >= self.metrics_interval:
+                    self._write_metrics()
+                    last_metrics = time.time()
+        except KeyboardInterrupt:
+            print("⏹️ 收到退出信号，等待处理中的文件完成...")
+        finally:
+            if observer:
+                observer.stop()
+                observer.join()
+            while self._in_flight:
+                self._collect_done(timeout=1.0)
+            self._pool.shutdown()
+            if self._retry:
+                print(f"⚠️ {len(self._retry)} 个文件留在 {PROCESSING_DIR}，下次启动时重新处理")
+            self._write_metrics()
+            for signum, handler in old_handlers.items():
+                signal.signal(signum, handler)
+
+    # ===== 进程池 =====
+    def _start_pool(self):
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=pool_context(),
+                                         initializer=_warm_worker, initargs=(self.stamp_path,))
+        # 进程池按需启动进程，这里先把全部进程拉起来，第一批文件不用等进程启动
+        wait([self._pool.submit(os.getpid) for _ in range(self.workers)])
+
+    def _submit(self, name, claimed, ready_at, suspect=False):
+        """提交一个已移入 _processing 的文件；进程池已损坏时放回重试队列并重建进程池"""
+        try:
+            future = self._pool.submit(_process_file, claimed, self.outbox, self.stamp_path)
+        except BrokenProcessPool:
+            self._retry.appendleft((name, claimed, ready_at, suspect))
+            self._recover_pool([])
+            return False
+        self._in_flight[future] = (name, claimed, ready_at, suspect)
+        return True
+
+    def _recover_pool(self, broken):
+        """
+        某个子进程异常退出（段错误、被 OOM 杀掉、os._exit 等）后整个进程池都不可用，
+        其余在途任务也会一起失败。只有一个文件在途时它就是元凶，直接移入 _failed；
+        否则无法判断是哪一个，全部标记为可疑放回重试队列，之后逐个单独处理以找出元凶。
+        """
+        # 进程池损坏后其余在途任务会很快全部结束（已完成的保留结果，未完成的抛出 BrokenProcessPool）
+        wait(list(self._in_flight), timeout=5.0)
+        for future, entry in list(self._in_flight.items()):
+            del self._in_flight[future]
+            try:
+                self._finish(entry, future.result(timeout=0))
+            except BrokenProcessPool:
+                broken.append(entry)
+            except Exception as e:
+                self._finish(entry, {"outputs": [], "errors": [f"流程中断: {e}"], "timings": []})
+
+        if len(broken) == 1:
+            self._finish(broken[0], {"outputs": [], "errors": ["处理该文件时工作进程异常退出"], "timings": []})
+        else:
+            for name, claimed, ready_at, _ in broken:
+                self._retry.append((name, claimed, ready_at, True))
+
+        print(f"⚠️ 工作进程异常退出，重建进程池（{len(broken)} 个文件受影响）")
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._start_pool()
+
+    # ===== 发现与防抖 =====
+    def _full_scan(self):
+        with os.scandir(self.inbox) as it:
+            for entry in it:
+                if entry.is_file() and _is_candidate(entry.name):
+                    self._touch(entry.path)
+
+    def _drain_events(self):
+        while True:
+            try:
+                path = self._events.get_nowait()
+            except queue.Empty:
+                return
+            if os.path.dirname(os.path.abspath(path)) == self.inbox and _is_candidate(os.path.basename(path)):
+                self._touch(path)
+
+    def _touch(self, path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._candidates.pop(path, None)
+            return
+        prev = self._candidates.get(path)
+        if prev is None:
+            self.metrics.detected += 1
+        if prev is None or (prev[0], prev[1]) != (st.st_size, st.st_mtime):
+            self._candidates[path] = (st.st_size, st.st_mtime, time.time())
+
+    def _dispatch_retry(self):
+        """重新提交进程池崩溃时放回的文件：可疑文件只在没有其他任务在途时单独处理"""
+        while self._retry:
+            name, claimed, ready_at, suspect = self._retry[0]
+            if any(entry[3] for entry in self._in_flight.values()):
+                return
+            if suspect and self._in_flight:
+                return
+            self._retry.popleft()
+            if not self._submit(name, claimed, ready_at, suspect):
+                return
+
+    def _dispatch_ready(self):
+        self._dispatch_retry()
+        # 重试队列清空之前不接新文件，避免新文件和可疑文件同时在途
+        if self._retry or any(entry[3] for entry in self._in_flight.values()):
+            return
+        now = time.time()
+        for path, (size, mtime, changed_at) in list(self._candidates.items()):
+            if now - changed_at < self.settle:
+                continue
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                del self._candidates[path]
+                continue
+            if (st.st_size, st.st_mtime) != (size, mtime):
+                self._candidates[path] = (st.st_size, st.st_mtime, now)
+                continue
+            name = os.path.basename(path)
+            # 写入方还没写完时 zip 目录不完整；Windows 下文件仍被占用时移动会失败
+            if not zipfile.is_zipfile(path):
+                if now - changed_at >= INCOMPLETE_TIMEOUT:
+                    del self._candidates[path]
+                    os.replace(path, _unique_path(os.path.join(self.inbox, FAILED_DIR), name))
+                    self.metrics.failed += 1
+                    print(f"❌ {name} 不是有效的 xlsx 文件")
+                continue
+            claimed = _unique_path(os.path.join(self.inbox, PROCESSING_DIR), name)
+            try:
+                os.replace(path, claimed)
+            except OSError:
+                continue
+            del self._candidates[path]
+            if not self._submit(name, claimed, now):
+                return
+
+    # ===== 结果收集 =====
+    def _collect_done(self, timeout):
+        if not self._in_flight:
+            time.sleep(timeout)
+            return
+        done, _ = wait(list(self._in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+        broken = []
+        for future in done:
+            entry = self._in_flight.pop(future)
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                broken.append(entry)
+                continue
+            except Exception as e:
+                result = {"outputs": [], "errors": [f"流程中断: {e}"], "timings": []}
+            self._finish(entry, result)
+        if broken:
+            self._recover_pool(broken)
+
+    def _finish(self, entry, result):
+        name, claimed, ready_at, _ = entry
+        latency = time.time() - ready_at
+        ok = not result["errors"]
+        target_dir = os.path.join(self.inbox, DONE_DIR if ok else FAILED_DIR)
+        os.replace(claimed, _unique_path(target_dir, name))
+        self.metrics.record_done(latency, ok, len(result["outputs"]))
+
+        timing_text = "  ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["timings"])
+        if ok:
+            print(f"✅ {name} → {len(result['outputs'])} 个文件  {latency:.2f}s  ({timing_text})")
+        else:
+            print(f"❌ {name}  {latency:.2f}s")
+            for err in result["errors"]:
+                print(f"   └─ {err}")
+
+    def _write_metrics(self):
+        snapshot = self.metrics.snapshot(waiting=len(self._candidates) + len(self._retry), in_flight=len(self._in_flight))
+        path = os.path.join(self.inbox, METRICS_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
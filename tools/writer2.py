@@ -1,5 +1,6 @@
 import openpyxl
 from openpyxl.utils import get_column_letter
+from tools.xlsx_save import save_workbook, COMPRESSION_FINAL
 
 # === 关键字配置 ===
 COMPANY_KEY_1 = "P&G"
@@ -7,11 +8,12 @@ COMPANY_KEY_2 = "PROCTER & GAMBLE"
 HEADER_END_KEYS = ["ITEM NO", "DESCRIPTION"]
 
 
-def set_smart_print_titles(file_path):
+def set_smart_print_titles(file_path, compression=COMPRESSION_FINAL):
     """
     针对新版 splitter 生成的文件设置打印标题行：
     1. 起始行：包含 P&G 的那一行 (通常是第 1 行)
     2. 结束行：包含 ITEM NO. 的那一行
+    compression: 保存时的压缩档位（见 tools.xlsx_save）
     """
     try:
         # 加载工作簿
@@ -59,7 +61,7 @@ def set_smart_print_titles(file_path):
             status_msg = f"失败：{', '.join(reasons)}"
             success = False
 
-        wb.save(file_path)
+        save_workbook(wb, file_path, compression)
         wb.close()
         return success, status_msg
 
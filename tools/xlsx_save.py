@@ -0,0 +1,94 @@
+import datetime
+import os
+import sys
+import tempfile
+import time
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
+
+import openpyxl
+from openpyxl.writer.excel import ExcelWriter
+
+# ========= 压缩档位 =========
+# stored: 不压缩，给马上会被下一步重新加载的中间文件用
+# fast:   deflate 1 级，批量运行时的折中
+# final:  deflate 默认级别（zlib 6），与 wb.save() 完全一致，给最终交付文件用
+COMPRESSION_STORED = "stored"
+COMPRESSION_FAST = "fast"
+COMPRESSION_FINAL = "final"
+
+_ZIP_SETTINGS = {
+    COMPRESSION_STORED: (ZIP_STORED, None),
+    COMPRESSION_FAST: (ZIP_DEFLATED, 1),
+    COMPRESSION_FINAL: (ZIP_DEFLATED, None),
+}
+
+
+def lxml_enabled():
+    """
+    openpyxl 在导入时决定是否用 lxml 序列化 XML（安装了 lxml 且环境变量 OPENPYXL_LXML 不为 False）。
+    返回当前进程实际使用的序列化方式。
+    """
+    return openpyxl.xml.LXML
+
+
+def _zip_settings(compression):
+    if isinstance(compression, int):
+        if not 0 <= compression <= 9:
+            raise ValueError(f"压缩级别必须在 0-9 之间: {compression}")
+        return (ZIP_STORED, None) if compression == 0 else (ZIP_DEFLATED, compression)
+    try:
+        return _ZIP_SETTINGS[compression]
+    except KeyError:
+        raise ValueError(f"未知的压缩档位: {compression}")
+
+
+def save_workbook(wb, path, compression=COMPRESSION_FINAL):
+    """
+    按指定压缩档位保存工作簿。
+    compression: 档位名（stored / fast / final）或 0-9 的 deflate 级别（0 表示不压缩）。
+    先写到同目录的临时文件再替换，中途崩溃时原文件保持完整。
+    """
+    method, level = _zip_settings(compression)
+    if wb.read_only:
+        raise TypeError("Workbook is read-only")
+    if wb.write_only and not wb.worksheets:
+        wb.create_sheet()
+
+    tmp_path = f"{path}.tmp"
+    archive = ZipFile(tmp_path, 'w', compression=method, compresslevel=level, allowZip64=True)
+    try:
+        wb.properties.modified = datetime.datetime.now(tz=datetime.timezone.utc).replace(tzinfo=None)
+        ExcelWriter(wb, archive).save()
+    except BaseException:
+        archive.close()
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+
+def _benchmark(input_path, repeat=5):
+    """对同一个工作簿按各档位重复保存，打印平均保存耗时、下一步重新加载的耗时和文件大小"""
+    wb = openpyxl.load_workbook(input_path)
+    print(f"文件: {os.path.basename(input_path)}  lxml: {'开' if lxml_enabled() else '关'}  重复: {repeat}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for compression in (COMPRESSION_STORED, COMPRESSION_FAST, COMPRESSION_FINAL):
+            out_path = os.path.join(tmp, f"{compression}.xlsx")
+            start = time.perf_counter()
+            for _ in range(repeat):
+                save_workbook(wb, out_path, compression)
+            save_ms = (time.perf_counter() - start) / repeat * 1000
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                openpyxl.load_workbook(out_path).close()
+            load_ms = (time.perf_counter() - start) / repeat * 1000
+
+            size = os.path.getsize(out_path)
+            print(f"  {compression:<7} 保存 {save_ms:8.1f} ms  加载 {load_ms:8.1f} ms  {size / 1024:8.1f} KB")
+    wb.close()
+
+
+if __name__ == "__main__":
+    # 用法: python -m tools.xlsx_save <file.xlsx> [重复次数]
+    # 对比 lxml: 另设环境变量 OPENPYXL_LXML=False 再跑一次
+    _benchmark(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 5)
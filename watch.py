@@ -0,0 +1,30 @@
+import argparse
+import multiprocessing
+import os
+import sys
+
+root_path = os.path.dirname(os.path.abspath(__file__))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from tools.watcher import HotFolderService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="监听收件目录，自动执行 拆分 → 表头 → 盖章")
+    parser.add_argument("inbox", help="ERP 导出文件的收件目录")
+    parser.add_argument("outbox", help="处理结果的输出目录")
+    parser.add_argument("--stamp", default=os.path.join(root_path, "pic", "stamp.png"), help="印章图片路径")
+    parser.add_argument("--workers", type=int, default=None, help="常驻进程数，默认等于 CPU 核数")
+    parser.add_argument("--settle", type=float, default=0.5, help="文件多少秒内不再变化才认为写入完成")
+    parser.add_argument("--poll", action="store_true", help="不使用文件通知，强制轮询目录")
+    args = parser.parse_args()
+
+    service = HotFolderService(args.inbox, args.outbox, args.stamp, workers=args.workers,
+                               settle=args.settle, use_watchdog=not args.poll)
+    service.run()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()